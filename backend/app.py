@@ -1,13 +1,33 @@
 # backend/app.py
+# Only light modules are imported here; OR-Tools is loaded by the solver on first use (see serve.py for warm-up)
+from typing import List, Literal, Optional
+
 from dotenv import load_dotenv
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from inputAnalyzer import *
-from solver.solver import solve_appointment_routing_pca
-from solver.models import *
 
+# Before the imports below, they read their settings from the environment when imported
 load_dotenv()
 
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.cors import CORSMiddleware
+from pydantic import ValidationError
+from distance_matrix import fetch_distance_and_duration_arrays, get_distance_matrix_2d, get_full_distance_matrix
+from broker.base import get_broker
+from inputAnalyzer import (
+    check_and_enhance_optimization_request,
+    prefetch_appointment_matrix,
+    validate_and_save_company_information,
+    validate_appointments,
+)
+from jobs import get_job_status, submit_solve_job
+from scheduler import ArrivalTimeMiddleware, TenantQuotaExceeded, solve_options_from_headers, solve_scheduler
+from compression import CompressionMiddleware
+from responses import FastJSONResponse
+from matrix_transport import accepts_multipart, multipart_matrix_response, parse_enhanced_optimization_request
+from capture.recorder import solve_and_capture
+from solver.models import Appointment, CompanyInfo, DistanceMatrixRequest, OptimizationRequest
+
 
 app = FastAPI(title="VRP Solver API", 
               description="API for solving Vehicle Routing Problems for field service workers")
@@ -22,45 +42,119 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Negotiated brotli/gzip compression of responses above COMPRESSION_MINIMUM_SIZE bytes
+app.add_middleware(CompressionMiddleware)
+# Outermost, so solve deadlines count from the arrival of the request
+app.add_middleware(ArrivalTimeMiddleware)
+
 @app.get("/api/test")
 def handle_test():
     print("--- /api/test endpoint hit ---")
     return {"message": "CORS test successful!"}
 
+def read_solve_options(request: Request):
+    # Tenant, priority class and latency target of a solve request (X-Tenant-Id, X-Priority, X-Latency-Target-Ms)
+    # plus its arrival time
+    try:
+        return (*solve_options_from_headers(request.headers), request.state.arrived_at)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/api/company-info")
 def receive_company_info(company_info: CompanyInfo):
-    return validate_and_save_company_information(company_info)
+    return FastJSONResponse(validate_and_save_company_information(company_info))
 
 
 @app.post("/api/appointments")
 def receive_appointments(appointments: List[Appointment]):
-    return validate_appointments(appointments)
+    validation_response = validate_appointments(appointments)
+    prefetch_appointment_matrix(appointments, validation_response)
+    return FastJSONResponse(validation_response)
 
 @app.post("/api/distance-matrix")
-def full_matrix(payload: DistanceMatrixRequest):
+def full_matrix(payload: DistanceMatrixRequest, request: Request, format: Literal["lists", "columnar"] = "lists"):
+    # ?format=columnar returns the ids once and both matrices as base64 int32 arrays (DistanceMatrixResponse)
     try:
-        return get_distance_matrix_2d(payload.locations)
+        if format == "columnar":
+            return FastJSONResponse(get_full_distance_matrix(payload.locations))
+        if accepts_multipart(request):
+            distance_matrix, duration_matrix = fetch_distance_and_duration_arrays(payload.locations)
+            return multipart_matrix_response(
+                [loc.id for loc in payload.locations],
+                {"distance_matrix": distance_matrix, "duration_matrix": duration_matrix}
+            )
+        return FastJSONResponse(get_distance_matrix_2d(payload.locations))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/enhance-opti-request")
 def full_matrix(request:OptimizationRequest):
     try:
-        return check_and_enhance_optimization_request(request)
+        return FastJSONResponse(check_and_enhance_optimization_request(request))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 @app.post("/api/solve-without-check")
-def full_matrix(request:EnhancedOptimizationRequest):
+async def solve_without_check(request: Request, quick_start: Optional[bool] = None):
+    # Accepts an EnhancedOptimizationRequest as JSON or as multipart/form-data with binary matrices.
+    # With ?quick_start=true the search starts from the quick heuristic solution (default: for mixed fleets).
+    try:
+        enhanced_request = await parse_enhanced_optimization_request(request)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    solve_options = read_solve_options(request)
     try:
-        return solve_appointment_routing_pca(request)
+        solution = await solve_scheduler.run_async(
+            enhanced_request, *solve_options, use_quick_initial_solution=quick_start
+        )
+    except TenantQuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return FastJSONResponse(solution)
+
+@app.post("/api/quick-solve")
+async def quick_solve(request: Request):
+    # Sub-second heuristic for interactive edits, same input and output as /api/solve-without-check
+    try:
+        enhanced_request = await parse_enhanced_optimization_request(request)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    try:
+        solution = await run_in_threadpool(solve_and_capture, "quick", enhanced_request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return FastJSONResponse(solution)
+
+@app.post("/api/jobs")
+async def submit_job(request: Request):
+    # Queues an EnhancedOptimizationRequest (JSON or multipart) for the solver workers, poll /api/jobs/{job_id}.
+    # X-Tenant-Id, X-Priority and X-Latency-Target-Ms apply as for /api/solve-without-check.
+    if get_broker() is None:
+        raise HTTPException(status_code=503, detail="Job queue is not available, BROKER_URL is not set")
+    solve_options = read_solve_options(request)
+    try:
+        enhanced_request = await parse_enhanced_optimization_request(request)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    return FastJSONResponse(await run_in_threadpool(submit_solve_job, enhanced_request, *solve_options))
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    if get_broker() is None:
+        raise HTTPException(status_code=503, detail="Job queue is not available, BROKER_URL is not set")
+    status = get_job_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return FastJSONResponse(status)
 
 @app.post("/api/check-and-solve")
-def check_and_solve(request: OptimizationRequest):
+async def check_and_solve(request: OptimizationRequest, http_request: Request):
+    solve_options = read_solve_options(http_request)
     try:
-        enh =  check_and_enhance_optimization_request(request)
-        return solve_appointment_routing_pca(enh)
+        enh = await run_in_threadpool(check_and_enhance_optimization_request, request)
+        return FastJSONResponse(await solve_scheduler.run_async(enh, *solve_options))
+    except TenantQuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
        raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,154 @@
+"""
+Measures cold start of the backend: import time of the app module and the modules it imports directly,
+time until the server answers (and how much of it is not the app import), and latency of the first solve
+request (which includes lazy imports if the server was not warmed up).
+
+    cd backend && python -m benchmarks.startup_time --runs 5
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SOLVE_REQUEST = {
+    "company_info": {
+        "start_address": {"street": "Görlitzer Str. 3", "zip_code": "10997", "city": "Berlin"},
+        "finish_address": {"street": "Görlitzer Str. 3", "zip_code": "10997", "city": "Berlin"},
+        "number_of_workers": [{"vehicle_id": 0, "skills": None, "worker_amount": 1}],
+    },
+    "appointments": [
+        {
+            "appointment_start": f"2025-04-29 {hour:02d}:00:00.000",
+            "appointment_end": f"2025-04-29 {hour:02d}:30:00.000",
+            "address": {"street": f"Street {hour}", "zip_code": "10997", "city": "Berlin"},
+            "location": {"id": str(hour), "lat": 52.5, "lng": 13.4},
+            "number_of_workers": 1,
+        }
+        for hour in (9, 11)
+    ],
+    "time_matrix": [[0, 10, 12], [10, 0, 8], [12, 8, 0]],
+    "distance_matrix": [[0, 5000, 6000], [5000, 0, 4000], [6000, 4000, 0]],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(module: str) -> float:
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIRECTORY, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_import_breakdown(module: str) -> dict:
+    """
+    Returns the cumulative import time in seconds of every module imported directly by the given module,
+    from python -X importtime (which lists modules after their own imports).
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIRECTORY, capture_output=True, text=True, check=True
+    ).stderr
+    direct_imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level == 0:
+            if name.strip() == module:
+                return direct_imports
+            direct_imports = {}
+        elif level == 1:
+            direct_imports[name.strip()] = int(cumulative) / 1e6
+    raise RuntimeError(f"{module} not found in the import time output")
+
+
+def wait_until_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.02)
+    raise TimeoutError(f"Server did not answer {url} within {timeout}s")
+
+
+def post_json(url: str, payload: dict, headers: dict) -> None:
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json", **headers}
+    )
+    with urllib.request.urlopen(request, timeout=60) as response:
+        response.read()
+
+
+def measure_server(command: list, port: int) -> tuple:
+    """
+    Returns (seconds until /api/test answers, seconds for the first solve request).
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        command, cwd=BACKEND_DIRECTORY, env={**os.environ, "BIND": f"127.0.0.1:{port}"},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    try:
+        wait_until_ready(f"http://127.0.0.1:{port}/api/test")
+        ready = time.perf_counter() - started
+
+        solve_started = time.perf_counter()
+        # The search runs until its time limit, a short latency target keeps it at about one second
+        post_json(f"http://127.0.0.1:{port}/api/solve-without-check", SOLVE_REQUEST, {"X-Latency-Target-Ms": "1300"})
+        return ready, time.perf_counter() - solve_started
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+def summarize(label: str, values: list) -> None:
+    print(f"{label:<55} median {statistics.median(values):6.3f}s  min {min(values):6.3f}s  max {max(values):6.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark backend cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2, help="Workers of the preforked server")
+    args = parser.parse_args()
+
+    app_import = [measure_import("app") for _ in range(args.runs)]
+    summarize("import app", app_import)
+    breakdowns = [measure_import_breakdown("app") for _ in range(args.runs)]
+    components = {name: [breakdown.get(name, 0.0) for breakdown in breakdowns] for name in breakdowns[0]}
+    for name, values in sorted(components.items(), key=lambda item: -statistics.median(item[1]))[:8]:
+        summarize(f"  of which import {name}", values)
+    summarize("import numpy", [measure_import("numpy") for _ in range(args.runs)])
+    summarize("import solver.solver (OR-Tools)", [measure_import("solver.solver") for _ in range(args.runs)])
+
+    servers = {
+        "uvicorn, single process": lambda port: [
+            sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)
+        ],
+        f"serve.py, {args.workers} preforked workers": lambda port: [sys.executable, "serve.py"],
+    }
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    for label, command in servers.items():
+        results = []
+        for _ in range(args.runs):
+            port = free_port()
+            results.append(measure_server(command(port), port))
+        summarize(f"{label}: ready", [ready for ready, _ in results])
+        summarize(f"{label}: ready without app import", [ready - statistics.median(app_import) for ready, _ in results])
+        summarize(f"{label}: first solve", [first_solve for _, first_solve in results])
@@ -0,0 +1,62 @@
+import os
+from functools import lru_cache
+from typing import List, Optional, Protocol, Tuple
+
+# A claimed job that is not acknowledged within this time (its worker died) is handed out again.
+# Must be longer than the longest solve.
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "600"))
+
+
+class Broker(Protocol):
+    """
+    Job queues plus a key-value store with expiry, shared by all API and solver nodes.
+    """
+
+    def enqueue(self, queue: str, job_id: str, payload: bytes):
+        ...
+
+    def dequeue(self, queues: List[str], timeout: float) -> Optional[Tuple[str, str, bytes]]:
+        """
+        Blocks up to timeout seconds and claims the oldest job of the first non-empty queue,
+        returns (queue, job_id, payload), None if all queues stayed empty.
+        The job is leased to the caller until ack(); unacknowledged jobs go back to their queue after
+        JOB_LEASE_SECONDS, so every job is processed at least once.
+        """
+        ...
+
+    def ack(self, queue: str, job_id: str):
+        """
+        Removes a claimed job for good, called once it is finished.
+        """
+        ...
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        ...
+
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+
+@lru_cache(maxsize=None)
+def get_broker() -> Optional[Broker]:
+    """
+    Selects the broker with BROKER_URL:
+    - redis://host:6379/0 (or rediss://) for a Redis-protocol server, requires the redis package
+    - sqlite:///path/to/broker.db for a single machine, e.g. tests or local development
+    Without BROKER_URL there is no broker: jobs are not available and caches stay per process.
+    """
+    url = os.getenv("BROKER_URL")
+    if not url:
+        return None
+
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        from broker.redis_broker import RedisBroker
+
+        return RedisBroker(url, JOB_LEASE_SECONDS)
+
+    if url.startswith("sqlite:///"):
+        from broker.sqlite_broker import SqliteBroker
+
+        return SqliteBroker(url[len("sqlite:///"):], JOB_LEASE_SECONDS)
+
+    raise RuntimeError(f"Unsupported BROKER_URL: {url}")
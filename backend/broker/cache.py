@@ -0,0 +1,31 @@
+import os
+from typing import Optional
+
+from broker.base import get_broker
+
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "86400"))
+
+
+def cache_get(key: str) -> Optional[bytes]:
+    """
+    Reads from the cache shared through the broker. Without a broker, or if it is unreachable, nothing is cached:
+    callers then compute the value themselves.
+    """
+    broker = get_broker()
+    if broker is None:
+        return None
+    try:
+        return broker.get(key)
+    except Exception as e:
+        print(f"Shared cache read failed for {key}: {e}")
+        return None
+
+
+def cache_set(key: str, value: bytes, ttl: Optional[int] = CACHE_TTL_SECONDS):
+    broker = get_broker()
+    if broker is None:
+        return
+    try:
+        broker.set(key, value, ttl)
+    except Exception as e:
+        print(f"Shared cache write failed for {key}: {e}")
@@ -0,0 +1,78 @@
+import time
+from typing import List, Optional, Tuple
+
+POLL_INTERVAL_SECONDS = 0.1
+# How often a consumer looks for expired leases
+REQUEUE_INTERVAL_SECONDS = 10
+
+
+class RedisBroker:
+    """
+    Queues are Redis lists of job ids (LPUSH / LMOVE), the payloads are stored under their own keys.
+    A claimed job id is moved atomically to the processing list of its queue and its claim time is recorded,
+    ack removes both. Jobs whose lease expired are moved back to the front of their queue.
+    """
+
+    def __init__(self, url: str, lease_seconds: int):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("BROKER_URL points to Redis, which requires the redis package: pip install redis")
+
+        self.client = redis.Redis.from_url(url)
+        self.lease_seconds = lease_seconds
+        self.next_requeue = 0.0
+
+    def enqueue(self, queue: str, job_id: str, payload: bytes):
+        pipeline = self.client.pipeline()
+        pipeline.set(f"payload:{job_id}", payload)
+        pipeline.lpush(f"queue:{queue}", job_id)
+        pipeline.execute()
+
+    def requeue_expired(self, queue: str):
+        expired_before = time.time() - self.lease_seconds
+        for job_id in self.client.lrange(f"processing:{queue}", 0, -1):
+            # A consumer that died between LMOVE and recording the claim leaves no claim time, start its lease now
+            self.client.hsetnx(f"claims:{queue}", job_id, time.time())
+            claimed_at = float(self.client.hget(f"claims:{queue}", job_id) or 0)
+            # Only the consumer whose LREM removed the id puts it back
+            if claimed_at < expired_before and self.client.lrem(f"processing:{queue}", 1, job_id):
+                self.client.hdel(f"claims:{queue}", job_id)
+                self.client.rpush(f"queue:{queue}", job_id)
+
+    def claim(self, queue: str) -> Optional[Tuple[str, bytes]]:
+        job_id = self.client.lmove(f"queue:{queue}", f"processing:{queue}", "RIGHT", "LEFT")
+        if job_id is None:
+            return None
+        self.client.hset(f"claims:{queue}", job_id, time.time())
+        return job_id.decode(), self.client.get(f"payload:{job_id.decode()}") or b""
+
+    def dequeue(self, queues: List[str], timeout: float) -> Optional[Tuple[str, str, bytes]]:
+        deadline = time.monotonic() + timeout
+        while True:
+            if time.monotonic() >= self.next_requeue:
+                for queue in queues:
+                    self.requeue_expired(queue)
+                self.next_requeue = time.monotonic() + REQUEUE_INTERVAL_SECONDS
+
+            # Polled in order, a blocking pop cannot prefer one of several lists
+            for queue in queues:
+                job = self.claim(queue)
+                if job is not None:
+                    return (queue,) + job
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+    def ack(self, queue: str, job_id: str):
+        pipeline = self.client.pipeline()
+        pipeline.lrem(f"processing:{queue}", 1, job_id)
+        pipeline.hdel(f"claims:{queue}", job_id)
+        pipeline.delete(f"payload:{job_id}")
+        pipeline.execute()
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        self.client.set(key, value, ex=ttl)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
@@ -0,0 +1,115 @@
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+POLL_INTERVAL_SECONDS = 0.05
+# Expired entries are deleted on write, at most this often per process
+PURGE_INTERVAL_SECONDS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_queue ON jobs (queue, position);
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS entries_by_expiry ON entries (expires_at) WHERE expires_at IS NOT NULL;
+"""
+
+
+class SqliteBroker:
+    """
+    Broker in one SQLite file for a single machine: all processes that open the same file share queues
+    and caches. A job is claimed by setting claimed_at inside an immediate (write-locked) transaction
+    and deleted on ack; claims older than the lease are cleared again. Expired entries are purged on write.
+    """
+
+    def __init__(self, path: str, lease_seconds: int):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.purged_at = 0.0
+        self.local = threading.local()
+        with self.connection() as connection:
+            connection.executescript(SCHEMA)
+            # Broker files created before claims were leased
+            if "claimed_at" not in [column[1] for column in connection.execute("PRAGMA table_info(jobs)")]:
+                connection.execute("ALTER TABLE jobs ADD COLUMN claimed_at REAL")
+
+    def connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = connection
+        return connection
+
+    def enqueue(self, queue: str, job_id: str, payload: bytes):
+        self.connection().execute(
+            "INSERT INTO jobs (queue, job_id, payload) VALUES (?, ?, ?)", (queue, job_id, payload)
+        )
+
+    def claim(self, queues: List[str]) -> Optional[Tuple[str, str, bytes]]:
+        connection = self.connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs of workers that died are claimable again once their lease expired
+            connection.execute(
+                "UPDATE jobs SET claimed_at = NULL WHERE claimed_at < ?", (now - self.lease_seconds,)
+            )
+            job = None
+            for queue in queues:
+                row = connection.execute(
+                    "SELECT position, job_id, payload FROM jobs WHERE queue = ? AND claimed_at IS NULL "
+                    "ORDER BY position LIMIT 1", (queue,)
+                ).fetchone()
+                if row is not None:
+                    connection.execute("UPDATE jobs SET claimed_at = ? WHERE position = ?", (now, row[0]))
+                    job = (queue, row[1], bytes(row[2]))
+                    break
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return job
+
+    def dequeue(self, queues: List[str], timeout: float) -> Optional[Tuple[str, str, bytes]]:
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.claim(queues)
+            if job is not None or time.monotonic() >= deadline:
+                return job
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+    def ack(self, queue: str, job_id: str):
+        self.connection().execute("DELETE FROM jobs WHERE queue = ? AND job_id = ?", (queue, job_id))
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        now = time.time()
+        self.connection().execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl if ttl else None)
+        )
+        if now - self.purged_at >= PURGE_INTERVAL_SECONDS:
+            self.purged_at = now
+            self.connection().execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self.connection().execute(
+            "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] < time.time():
+            self.connection().execute("DELETE FROM entries WHERE key = ? AND expires_at < ?", (key, time.time()))
+            return None
+        return bytes(row[0])
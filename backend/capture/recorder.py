@@ -0,0 +1,157 @@
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime
+from importlib.metadata import version
+from typing import Any, Dict, List
+
+from solver.models import EnhancedOptimizationRequest, Solution
+
+# Share of solves that are recorded, 0 disables capturing
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "0"))
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "captures")
+CAPTURE_FORMAT_VERSION = 1
+
+
+def run_solver(solver: str, request: EnhancedOptimizationRequest, settings: Dict[str, Any]) -> Solution:
+    # Imported on use, OR-Tools is only loaded when the full solver runs
+    if solver == "quick":
+        from solver.quick import solve_appointment_routing_quick
+
+        return solve_appointment_routing_quick(request, **settings)
+    if solver == "pca":
+        from solver.solver import solve_appointment_routing_pca
+
+        return solve_appointment_routing_pca(request, **settings)
+    raise ValueError(f"Unknown solver: {solver}")
+
+
+def solve_and_capture(solver: str, request: EnhancedOptimizationRequest, **settings: Any) -> Solution:
+    """
+    Runs the solver and records a sample of the solves (CAPTURE_SAMPLE_RATE) for offline replay.
+    """
+    started = time.perf_counter()
+    solution = run_solver(solver, request, settings)
+    solve_seconds = time.perf_counter() - started
+
+    if CAPTURE_SAMPLE_RATE > 0 and random.random() < CAPTURE_SAMPLE_RATE:
+        try:
+            path = write_capture(CAPTURE_DIR, solver, request, settings, solution, {"solve_seconds": solve_seconds})
+            print(f"Captured solve to {path}")
+        except Exception as e:
+            print(f"Capturing the solve failed: {e}")
+
+    return solution
+
+
+def route_indices(request: EnhancedOptimizationRequest, solution: Solution) -> List[List[int]]:
+    """
+    The routes as appointment indices, which stay comparable after the addresses are stripped.
+    """
+    index_by_object = {id(appt): index for index, appt in enumerate(request.appointments)}
+    return [
+        [index_by_object.get(id(appt), request.appointments.index(appt)) for appt in route.appointments]
+        for route in solution.routes
+    ]
+
+
+def summarize_solution(request: EnhancedOptimizationRequest, solution: Solution) -> Dict[str, Any]:
+    return {
+        "method_used": solution.method_used,
+        "total_distance_traveled": solution.total_distance_traveled,
+        "max_distance_traveled": solution.max_distance_traveled,
+        "total_time_traveled": sum(route.time_traveled for route in solution.routes),
+        "routes": route_indices(request, solution),
+    }
+
+
+def strip_personal_data(request: EnhancedOptimizationRequest) -> Dict[str, Any]:
+    """
+    The request without matrices, addresses and ids. Coordinates are moved to the centroid of the appointments,
+    with longitudes scaled by the cosine of its latitude, so distances between the locations are kept
+    but the place is not. Times, crew sizes and skills are kept, the solver needs them.
+    """
+    import numpy as np
+
+    data = request.model_dump(exclude={"time_matrix", "distance_matrix", "time_matrices"})
+
+    placeholder = {"street": "", "zip_code": "", "city": ""}
+    data["company_info"]["start_address"] = {**placeholder, "street": "Depot"}
+    data["company_info"]["finish_address"] = {**placeholder, "street": "Depot"}
+
+    if request.appointments:
+        center_lat = float(np.mean([appt.location.lat for appt in request.appointments]))
+        center_lng = float(np.mean([appt.location.lng for appt in request.appointments]))
+        lng_scale = float(np.cos(np.radians(center_lat)))
+        for index, appt in enumerate(data["appointments"]):
+            appt["address"] = {**placeholder, "street": f"Appointment {index}"}
+            appt["location"] = {
+                "id": str(index),
+                "lat": round(appt["location"]["lat"] - center_lat, 6),
+                "lng": round((appt["location"]["lng"] - center_lng) * lng_scale, 6),
+            }
+
+    return data
+
+
+def write_capture(
+    directory: str,
+    solver: str,
+    request: EnhancedOptimizationRequest,
+    settings: Dict[str, Any],
+    solution: Solution,
+    timings: Dict[str, float]
+) -> str:
+    """
+    Writes one compressed .npz archive: the matrices as arrays plus the stripped request, solver settings,
+    timings and solution as JSON.
+    """
+    import numpy as np
+
+    from solver.quick import QUICK_MAX_PASSES
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"capture-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.npz")
+
+    metadata = {
+        "format_version": CAPTURE_FORMAT_VERSION,
+        "captured_at": datetime.now().isoformat(timespec="seconds"),
+        "solver": solver,
+        "settings": settings,
+        # Replays run the quick heuristic for this many passes instead of its time limit
+        "quick_max_passes": QUICK_MAX_PASSES,
+        "timings": timings,
+        # Read from the package metadata, importing ortools would load it on the quick solver path
+        "versions": {"ortools": version("ortools"), "numpy": np.__version__},
+        "request": strip_personal_data(request),
+        "solution": summarize_solution(request, solution),
+    }
+    arrays = {
+        "time_matrix": np.asarray(request.time_matrix, dtype=np.int32),
+        "distance_matrix": np.asarray(request.distance_matrix, dtype=np.int32),
+    }
+    if request.time_matrices is not None:
+        arrays["time_matrices"] = np.asarray(request.time_matrices)
+
+    np.savez_compressed(path, metadata=np.frombuffer(json.dumps(metadata).encode(), dtype=np.uint8), **arrays)
+    return path
+
+
+def read_capture(path: str) -> Dict[str, Any]:
+    """
+    Returns the metadata of a capture with the rebuilt request under "enhanced_request".
+    """
+    import numpy as np
+
+    with np.load(path) as archive:
+        metadata = json.loads(archive["metadata"].tobytes().decode())
+        request_data = metadata["request"]
+        request_data["time_matrix"] = archive["time_matrix"]
+        request_data["distance_matrix"] = archive["distance_matrix"]
+        if "time_matrices" in archive:
+            request_data["time_matrices"] = archive["time_matrices"]
+
+    metadata["enhanced_request"] = EnhancedOptimizationRequest(**request_data)
+    return metadata
@@ -0,0 +1,131 @@
+"""
+Replays captured solves (see capture/recorder.py) against the solver of this checkout.
+
+    cd backend && python -m capture.replay captures/ --solution-limit 200 --output results.json
+    python -m capture.replay captures/ --solution-limit 200 --compare results.json   # on another build
+    python -m capture.replay captures/capture-....npz --profile replay.prof
+
+The quick heuristic (alone or as the start of the full solver) runs for the number of passes recorded
+in the capture instead of its time limit. With --solution-limit the full solver also stops after that many
+solutions instead of the captured time limit, so every run on the same build returns the same routes
+and differences between builds come from the code.
+"""
+import argparse
+import cProfile
+import contextlib
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from capture.recorder import read_capture, run_solver, summarize_solution
+from solver.quick import QUICK_MAX_PASSES
+
+
+def find_archives(paths: List[str]) -> List[str]:
+    archives = []
+    for path in paths:
+        if os.path.isdir(path):
+            archives.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".npz")
+            )
+        else:
+            archives.append(path)
+    return archives
+
+
+def replay(path: str, solution_limit: Optional[int] = None, profile: Optional[cProfile.Profile] = None) -> Dict[str, Any]:
+    capture = read_capture(path)
+    settings = dict(capture["settings"])
+    # Captures from before quick_max_passes was recorded used the default
+    quick_max_passes = capture.get("quick_max_passes", QUICK_MAX_PASSES)
+    if capture["solver"] == "quick":
+        settings["time_limit_ms"] = None
+        settings["max_passes"] = quick_max_passes
+    if capture["solver"] == "pca":
+        settings["quick_max_passes"] = quick_max_passes
+    if solution_limit and capture["solver"] == "pca":
+        settings["solution_limit"] = solution_limit
+        # The time limit only remains as a safety net
+        settings["optimization_time_limit"] = max(settings.get("optimization_time_limit", 15), 600)
+
+    request = capture["enhanced_request"]
+    if profile is not None:
+        profile.enable()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        solution = run_solver(capture["solver"], request, settings)
+    solve_seconds = time.perf_counter() - started
+    if profile is not None:
+        profile.disable()
+
+    return {
+        "solver": capture["solver"],
+        "settings": settings,
+        "appointments": len(request.appointments),
+        "vehicles": len(request.company_info.number_of_workers),
+        "solve_seconds": round(solve_seconds, 3),
+        "captured_solve_seconds": round(capture["timings"]["solve_seconds"], 3),
+        "captured_total_distance_traveled": capture["solution"]["total_distance_traveled"],
+        "solution": summarize_solution(request, solution),
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> int:
+    """
+    Prints the differences to a baseline run and returns the number of archives whose routes differ.
+    """
+    differing = 0
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name}: not in baseline")
+            continue
+        old, new = baseline[name]["solution"], result["solution"]
+        same_routes = old["routes"] == new["routes"]
+        differing += not same_routes
+        print(
+            f"{name}: {'same routes' if same_routes else 'ROUTES DIFFER'}, "
+            f"distance {old['total_distance_traveled']} -> {new['total_distance_traveled']}, "
+            f"travel time {old['total_time_traveled']} -> {new['total_time_traveled']}, "
+            f"solve {baseline[name]['solve_seconds']}s -> {result['solve_seconds']}s"
+        )
+    return differing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay captured solves")
+    parser.add_argument("paths", nargs="+", help="Capture archives or directories of them")
+    parser.add_argument("--solution-limit", type=int, default=None,
+                        help="Stop the search after this many solutions (reproducible) instead of the time limit")
+    parser.add_argument("--output", help="Write the results as JSON, to compare builds later")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to diff against")
+    parser.add_argument("--profile", help="Write cProfile stats of the solver calls to this file")
+    args = parser.parse_args()
+
+    profile = cProfile.Profile() if args.profile else None
+    results = {}
+    for path in find_archives(args.paths):
+        name = os.path.basename(path)
+        results[name] = replay(path, args.solution_limit, profile)
+        result = results[name]
+        print(
+            f"{name}: {result['solver']}, {result['appointments']} appointments, {result['vehicles']} vehicles, "
+            f"distance {result['solution']['total_distance_traveled']} "
+            f"(captured {result['captured_total_distance_traveled']}), "
+            f"{result['solve_seconds']}s (captured {result['captured_solve_seconds']}s)"
+        )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if profile is not None:
+        profile.dump_stats(args.profile)
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(20)
+
+    if args.compare:
+        with open(args.compare) as file:
+            sys.exit(1 if compare(results, json.load(file)) else 0)
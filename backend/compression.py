@@ -0,0 +1,115 @@
+import gzip
+import os
+from typing import Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this (in bytes) are sent uncompressed
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+# Levels for dynamic responses: gzip 6 and brotli 5 compress distance matrices nearly as well as the maximum
+# levels at a fraction of the CPU time
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+# Bodies from this size on are compressed in a worker thread instead of blocking the event loop
+THREAD_MINIMUM_SIZE = 128 * 1024
+# Only these content types are compressed, everything else (images, already compressed data) is sent as is
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "text/", "multipart/")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Picks br (if the brotli package is installed) or gzip from an Accept-Encoding header, None for no compression.
+    Encodings with q=0 are refused; among accepted ones the higher q-value wins, brotli on a tie.
+    """
+    qualities = {}
+    for entry in accept_encoding.lower().split(","):
+        name, _, parameters = entry.partition(";")
+        quality = 1.0
+        parameter, _, value = parameters.partition("=")
+        if parameter.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip()] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    candidates = [(qualities.get(encoding, wildcard), -rank, encoding) for rank, encoding in enumerate(available)]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+def compress(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+
+class CompressionMiddleware:
+    """
+    Compresses complete responses with brotli or gzip as negotiated from Accept-Encoding.
+    Streamed responses (more_body) are passed through uncompressed, the API does not stream.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE, gzip_level: int = GZIP_LEVEL,
+                 brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start_message: Optional[Message] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                compressible = (
+                    message["status"] != 206
+                    and "content-encoding" not in headers
+                    and headers.get("content-type", "").startswith(COMPRESSIBLE_CONTENT_TYPES)
+                )
+                if not compressible:
+                    await send(message)
+                    return
+                # Held back until the body shows whether it is compressed
+                start_message = message
+                return
+
+            if start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if encoding is not None and len(body) >= self.minimum_size and not message.get("more_body", False):
+                if len(body) >= THREAD_MINIMUM_SIZE:
+                    body = await anyio.to_thread.run_sync(
+                        compress, body, encoding, self.gzip_level, self.brotli_quality
+                    )
+                else:
+                    body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                message = {**message, "body": body}
+
+            await send(start_message)
+            start_message = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -1,94 +1,120 @@
+import base64
 import os
-from typing import List
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from zoneinfo import ZoneInfo
 
-import numpy as np
-import requests
+from solver.models import Location, DistanceMatrixResponse, DistanceAndDurationMatrices
 
-from solver.models import Location, MatrixElement, DistanceMatrixResponse, DistanceAndDurationMatrices
+if TYPE_CHECKING:
+    import numpy as np
 
 
 def build_location_string(locations: List[Location]) -> str:
     return "|".join([f"{loc.lat},{loc.lng}" for loc in locations])
 
-def get_full_distance_matrix(locations: List[Location]) -> DistanceMatrixResponse:
-    api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-    if not api_key:
-        raise EnvironmentError("API key not set")
-
-    matrix = []
-    max_elements = 100
-    max_destinations = max_elements  # since we'll send 1 origin per request
-
-    destination_strings = [f"{loc.lat},{loc.lng}" for loc in locations]
+def encode_matrix_values(matrix: "np.ndarray") -> str:
+    import numpy as np
 
-    for i, origin in enumerate(locations):
-        origin_str = f"{origin.lat},{origin.lng}"
-        from_id = origin.id
-
-        for j in range(0, len(locations), max_destinations):
-            dest_batch = destination_strings[j:j + max_destinations]
-            dest_ids = locations[j:j + max_destinations]
-            dest_str = "|".join(dest_batch)
-
-            url = (
-                f"https://maps.googleapis.com/maps/api/distancematrix/json?"
-                f"origins={origin_str}&destinations={dest_str}&"
-                f"mode=driving&units=metric&key={api_key}"
-            )
+    return base64.b64encode(np.ascontiguousarray(matrix, dtype="<i4").tobytes()).decode("ascii")
 
-            response = requests.get(url)
-            data = response.json()
+def get_full_distance_matrix(locations: List[Location]) -> DistanceMatrixResponse:
+    """
+    Returns distances (meters) and durations (seconds) in columnar form. Failed cells are 0 in the
+    value arrays and listed once in failed_cells.
+    """
+    import numpy as np
+
+    distance_matrix, duration_matrix = fetch_distance_and_duration_seconds(locations)
+
+    failed = duration_matrix < 0
+    distance_matrix[failed] = 0
+    duration_matrix[failed] = 0
+
+    return DistanceMatrixResponse(
+        ids=[loc.id for loc in locations],
+        distance_values=encode_matrix_values(distance_matrix),
+        duration_values=encode_matrix_values(duration_matrix),
+        failed_cells=np.argwhere(failed).tolist()
+    )
 
-            if data["status"] != "OK":
-                raise ValueError(data.get("error_message", "Distance Matrix API error"))
 
-            elements = data["rows"][0]["elements"]
-
-            for offset, element in enumerate(elements):
-                to_id = dest_ids[offset].id
-                if element["status"] == "OK":
-                    matrix.append(MatrixElement(
-                        from_id=from_id,
-                        to_id=to_id,
-                        distance_text=element["distance"]["text"],
-                        distance_value=element["distance"]["value"],
-                        duration_text=element["duration"]["text"],
-                        duration_value=element["duration"]["value"]
-                    ))
-                else:
-                    matrix.append(MatrixElement(
-                        from_id=from_id,
-                        to_id=to_id,
-                        distance_text="N/A",
-                        distance_value=0,
-                        duration_text="N/A",
-                        duration_value=0
-                    ))
-
-    return DistanceMatrixResponse(matrix=matrix)
+@lru_cache(maxsize=None)
+def get_local_road_graph():
+    from road_network.graph import RoadGraph
+
+    graph_directory = os.getenv("LOCAL_ROUTING_GRAPH")
+    if not graph_directory:
+        raise EnvironmentError("LOCAL_ROUTING_GRAPH not set")
+    return RoadGraph(graph_directory)
+
+
+def fetch_distance_and_duration_seconds(
+    origins: List[Location],
+    destinations: Optional[List[Location]] = None,
+    departure_time: Optional[int] = None
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Returns the distance (meters) and duration (seconds) matrices from every origin to every
+    destination (default: the origins) as int32 arrays. Cells that could not be resolved are set to -1.
+    MATRIX_PROVIDER selects the Google Distance Matrix API ("google", default) or the
+    local road graph built by road_network.build_graph ("local", without traffic data).
+    """
+    destinations = origins if destinations is None else destinations
+    provider = os.getenv("MATRIX_PROVIDER", "google").lower()
+    if provider == "local":
+        return get_local_road_graph().distance_and_duration_seconds(origins, destinations)
+    if provider != "google":
+        raise EnvironmentError(f"Unknown MATRIX_PROVIDER: {provider}")
+    return fetch_google_distance_and_duration_seconds(origins, destinations, departure_time)
+
+
+def fetch_distance_and_duration_arrays(
+    origins: List[Location],
+    destinations: Optional[List[Location]] = None
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Like fetch_distance_and_duration_seconds, but with durations in minutes as used by the solver.
+    """
+    distance_matrix, duration_matrix = fetch_distance_and_duration_seconds(origins, destinations)
+    return distance_matrix, duration_matrix // 60  # seconds → minutes, -1 stays -1
+
+
+def fetch_google_distance_and_duration_seconds(
+    origins: List[Location],
+    destinations: List[Location],
+    departure_time: Optional[int] = None
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    With a departure_time (unix timestamp in the future) the durations include the predicted traffic.
+    """
+    import numpy as np
+    import requests
 
-def get_distance_matrix_2d(locations: List[Location]) -> DistanceAndDurationMatrices:
     api_key = os.getenv("GOOGLE_MAPS_API_KEY")
     if not api_key:
         raise EnvironmentError("API key not set")
 
-    n = len(locations)
-    distance_matrix = np.zeros((n, n), dtype=int)
-    duration_matrix = np.zeros((n, n), dtype=int)
+    distance_matrix = np.zeros((len(origins), len(destinations)), dtype=np.int32)
+    duration_matrix = np.zeros((len(origins), len(destinations)), dtype=np.int32)
 
-    # Google API limit: max 100 elements = origins x destinations
+    # Google API limit: max 100 elements = origins x destinations, max 25 origins per request.
+    # Few destinations (e.g. only the depot) are fetched for several origins at once.
     max_elements = 100
-    max_destinations = max_elements  # because we only send 1 origin per batch
+    max_destinations = max_elements
+    max_origins = max(1, min(25, max_elements // max(1, len(destinations))))
 
-    # Pre-format all destination strings
+    # Pre-format all origin and destination strings
+    origin_strings = [f"{loc.lat},{loc.lng}" for loc in origins]
     destination_strings = [
-        f"{loc.lat},{loc.lng}" for loc in locations
+        f"{loc.lat},{loc.lng}" for loc in destinations
     ]
 
-    for i, origin in enumerate(locations):
-        origin_str = f"{origin.lat},{origin.lng}"
+    for i in range(0, len(origins), max_origins):
+        origin_str = "|".join(origin_strings[i:i + max_origins])
 
-        for j in range(0, n, max_destinations):
+        for j in range(0, len(destinations), max_destinations):
             # Slice destination batch
             dest_batch = destination_strings[j:j + max_destinations]
             dest_str = "|".join(dest_batch)
@@ -98,6 +124,8 @@ def get_distance_matrix_2d(locations: List[Location]) -> DistanceAndDurationMatr
                 f"origins={origin_str}&destinations={dest_str}&"
                 f"mode=driving&units=metric&key={api_key}"
             )
+            if departure_time is not None:
+                url += f"&departure_time={departure_time}"
 
             response = requests.get(url)
             data = response.json()
@@ -105,20 +133,94 @@ def get_distance_matrix_2d(locations: List[Location]) -> DistanceAndDurationMatr
             if data["status"] != "OK":
                 raise ValueError(data.get("error_message", "Distance Matrix API error"))
 
-            elements = data["rows"][0]["elements"]
-            for offset, element in enumerate(elements):
-                dest_index = j + offset
-                if element["status"] == "OK":
-                    distance_matrix[i][dest_index] = element["distance"]["value"]
-                    duration_matrix[i][dest_index] = element["duration"]["value"] // 60  # seconds → minutes
-                else:
-                    distance_matrix[i][dest_index] = -1
-                    duration_matrix[i][dest_index] = -1
+            for row_offset, row in enumerate(data["rows"]):
+                origin_index = i + row_offset
+                for offset, element in enumerate(row["elements"]):
+                    dest_index = j + offset
+                    if element["status"] == "OK":
+                        duration = element.get("duration_in_traffic", element["duration"])
+                        distance_matrix[origin_index, dest_index] = element["distance"]["value"]
+                        duration_matrix[origin_index, dest_index] = duration["value"]
+                    else:
+                        distance_matrix[origin_index, dest_index] = -1
+                        duration_matrix[origin_index, dest_index] = -1
+
+    return distance_matrix, duration_matrix
+
+
+def get_time_bucket_starts() -> List[int]:
+    """
+    Reads the departure time buckets from TIME_BUCKETS, e.g. "06:00,10:00,15:00".
+    Returns the bucket starts in minutes since midnight, or an empty list if time dependent matrices are off.
+    """
+    bucket_starts = []
+    for bucket in os.getenv("TIME_BUCKETS", "").split(","):
+        if bucket.strip():
+            hours, minutes = bucket.strip().split(":")
+            bucket_starts.append(int(hours) * 60 + int(minutes))
+    return sorted(bucket_starts)
+
+
+def next_departure_timestamp(day: date, minute_of_day: int) -> int:
+    # Traffic predictions are only available for the future, so past days are moved forward by whole weeks
+    timezone = ZoneInfo(os.getenv("TIME_ZONE", "Europe/Berlin"))
+    departure = datetime.combine(day, time(minute_of_day // 60, minute_of_day % 60), tzinfo=timezone)
+    now = datetime.now(timezone)
+    while departure <= now:
+        departure += timedelta(days=7)
+    return int(departure.timestamp())
+
+
+def compact_durations(durations: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    # Durations are minutes, so int16 is enough unless a route takes longer than three weeks
+    if durations.size and durations.max() <= np.iinfo(np.int16).max:
+        return durations.astype(np.int16)
+    return durations
+
+
+def build_matrix_set(
+    origins: List[Location],
+    destinations: List[Location],
+    day: Optional[date],
+    bucket_starts: List[int]
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Returns the distance matrix (meters) and a stack of duration matrices (minutes) with shape
+    (buckets, origins, destinations), one per departure time bucket. Without buckets the stack holds
+    the static duration matrix only. The stack uses int16 where possible.
+    """
+    import numpy as np
+
+    provider = os.getenv("MATRIX_PROVIDER", "google").lower()
+
+    if not bucket_starts or provider != "google":
+        # Providers without traffic data share one duration matrix between all buckets
+        distance_matrix, durations = fetch_distance_and_duration_arrays(origins, destinations)
+        bucket_count = max(1, len(bucket_starts))
+        return distance_matrix, np.broadcast_to(compact_durations(durations), (bucket_count,) + durations.shape)
+
+    duration_matrices = np.empty((len(bucket_starts), len(origins), len(destinations)), dtype=np.int32)
+    distance_matrix = None
+    for bucket, bucket_start in enumerate(bucket_starts):
+        distances, durations = fetch_distance_and_duration_seconds(
+            origins, destinations, next_departure_timestamp(day, bucket_start)
+        )
+        duration_matrices[bucket] = durations // 60  # seconds → minutes
+        if distance_matrix is None:
+            distance_matrix = distances
+    return distance_matrix, compact_durations(duration_matrices)
+
+
+def get_distance_matrix_2d(locations: List[Location]) -> DistanceAndDurationMatrices:
+    distance_matrix, duration_matrix = fetch_distance_and_duration_arrays(locations)
 
     ids = [loc.id for loc in locations]
-    response = DistanceAndDurationMatrices(
+    # Built from our own arrays, so the entries are not validated again
+    response = DistanceAndDurationMatrices.model_construct(
         ids=ids,
         distance_matrix=distance_matrix.tolist(),
         duration_matrix=duration_matrix.tolist()
     )
-    return response
\ No newline at end of file
+    return response
@@ -10,4 +10,6 @@ APPOINTMENT_ZIPCODE_EMPTY = "Appointment zip code must not be empty"
 APPOINTMENT_CITY_EMPTY = "Appointment city code must not be empty"
 APPOINTMENT_DURATION_TOO_LONG = "Appointments must not be longer than 24 hours"
 ADDRESS_NOT_FOUND_WITH_GOOGLE = "Address could not be found with google maps API"
-APPOINTMENT_OVERLAP_TO_BIG = "⚠️ Appointment overlap exceeds available workers."
\ No newline at end of file
+APPOINTMENT_OVERLAP_TO_BIG = "⚠️ Appointment overlap exceeds available workers."
+APPOINTMENT_NO_ELIGIBLE_VEHICLE = "No vehicle has the skills and workers required for the appointment"
+QUICK_START_REJECTED = "⚠️ The quick heuristic routes were rejected as start solution, searching from path cheapest arc instead"
@@ -0,0 +1,45 @@
+import os
+from functools import lru_cache
+from typing import Protocol
+
+from solver.models import EnhancedAddressResponse
+
+
+class GeocoderBackend(Protocol):
+    # Remote backends are resolved concurrently, local ones are fast enough to be called inline
+    is_remote: bool
+
+    def geocode(self, street: str, zip_code: str, city: str) -> EnhancedAddressResponse:
+        ...
+
+
+class GoogleMapsGeocoder:
+    is_remote = True
+
+    def geocode(self, street: str, zip_code: str, city: str) -> EnhancedAddressResponse:
+        # Imported on use, requests is not needed to start the app
+        from geocoding.google import validate_single_address_with_google_maps
+
+        return validate_single_address_with_google_maps(street, zip_code, city)
+
+
+@lru_cache(maxsize=None)
+def get_geocoder() -> GeocoderBackend:
+    """
+    Selects the geocoder with GEOCODER_BACKEND: "google" (default) or "local".
+    The local backend reads the index built by geocoding.local_index from LOCAL_GEOCODER_INDEX.
+    """
+    backend = os.getenv("GEOCODER_BACKEND", "google").lower()
+
+    if backend == "google":
+        return GoogleMapsGeocoder()
+
+    if backend == "local":
+        from geocoding.local_index import LocalAddressIndex, LocalGeocoder
+
+        index_path = os.getenv("LOCAL_GEOCODER_INDEX")
+        if not index_path:
+            raise RuntimeError("LOCAL_GEOCODER_INDEX is not set in environment variables")
+        return LocalGeocoder(LocalAddressIndex.load(index_path))
+
+    raise RuntimeError(f"Unknown GEOCODER_BACKEND: {backend}")
@@ -0,0 +1,77 @@
+import os
+import threading
+
+import requests
+
+from solver.models import EnhancedAddressResponse
+
+http_sessions = threading.local()
+
+
+def get_http_session() -> requests.Session:
+    # One session per geocoding thread so that connections to the API are kept alive between requests
+    session = getattr(http_sessions, "session", None)
+    if session is None:
+        session = requests.Session()
+        http_sessions.session = session
+    return session
+
+
+def validate_single_address_with_google_maps(street: str, zip_code: str, city: str) -> EnhancedAddressResponse:
+    assert isinstance(street, str), "street must be a string"
+    assert isinstance(zip_code, str), "zip_code must be a string"
+    assert isinstance(city, str), "city must be a string"
+
+    api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+    if not api_key:
+        raise RuntimeError("GOOGLE_MAPS_API_KEY is not set in environment variables")
+
+    full_address = f"{street}, {zip_code} {city}"
+    params = {
+        "address": full_address,
+        "key": api_key
+    }
+
+    response = get_http_session().get("https://maps.googleapis.com/maps/api/geocode/json", params=params)
+
+    if response.status_code != 200:
+        return EnhancedAddressResponse(
+            could_be_fully_found=False,
+            error_information=f"Error contacting Google Maps API for address: {full_address}",
+            street=street,
+            zipcode=zip_code,
+            city=city
+        )
+
+    data = response.json()
+
+    if not data.get("results"):
+        return EnhancedAddressResponse(
+            could_be_fully_found=False,
+            error_information=f"Address could not be found using Google Maps API: {full_address}",
+            street=street,
+            zipcode=zip_code,
+            city=city
+        )
+
+    result = data["results"][0]
+    if result.get("partial_match"):
+        return EnhancedAddressResponse(
+            could_be_fully_found=False,
+            error_information=f"Address was only partially recognized — possibly invalid: {full_address}",
+            street=street,
+            zipcode=zip_code,
+            city=city,
+            latitude=result["geometry"]["location"]["lat"],
+            longitude=result["geometry"]["location"]["lng"]
+        )
+
+    return EnhancedAddressResponse(
+        could_be_fully_found=True,
+        error_information=None,
+        street=street,
+        zipcode=zip_code,
+        city=city,
+        latitude=result["geometry"]["location"]["lat"],
+        longitude=result["geometry"]["location"]["lng"]
+    )
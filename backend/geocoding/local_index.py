@@ -0,0 +1,316 @@
+import argparse
+import csv
+import difflib
+import json
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from geocoding.normalize import normalize_text, split_housenumber
+from solver.models import EnhancedAddressResponse
+
+# (street name, house number, zip code, city, lat, lng), all strings already normalized
+AddressRecord = Tuple[str, str, str, str, float, float]
+
+CSV_COLUMNS = {
+    "street": ("street", "addr:street"),
+    "housenumber": ("housenumber", "house_number", "addr:housenumber"),
+    "zip_code": ("zip_code", "zipcode", "postcode", "zip", "addr:postcode"),
+    "city": ("city", "addr:city"),
+    "lat": ("lat", "latitude"),
+    "lng": ("lng", "lon", "longitude"),
+}
+FUZZY_STREET_CUTOFF = 0.85
+FUZZY_ZIP_CUTOFF = 0.8
+FUZZY_CITY_CUTOFF = 0.8
+# Weights of street, zip code and city similarity when ranking fuzzy matches
+FUZZY_WEIGHTS = (0.6, 0.2, 0.2)
+
+
+class StreetMatch(NamedTuple):
+    # Normalized street name and zip code found in the index, may differ from the searched ones
+    street_name: str
+    zip_code: str
+    housenumbers: Dict[str, int]
+
+
+def pick_column(row: Dict[str, str], column: str) -> str:
+    for alias in CSV_COLUMNS[column]:
+        if row.get(alias):
+            return row[alias]
+    return ""
+
+
+def make_record(street: str, housenumber: str, zip_code: str, city: str, lat: float, lng: float) -> Optional[AddressRecord]:
+    street_name, street_number = split_housenumber(normalize_text(street))
+    housenumber = normalize_text(housenumber).replace(" ", "") or street_number
+    zip_code = normalize_text(zip_code)
+    if not street_name or not zip_code:
+        return None
+    return street_name, housenumber, zip_code, normalize_text(city), lat, lng
+
+
+def read_csv_records(path: str) -> Iterator[AddressRecord]:
+    with open(path, newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            try:
+                lat, lng = float(pick_column(row, "lat")), float(pick_column(row, "lng"))
+            except ValueError:
+                continue
+            record = make_record(
+                pick_column(row, "street"), pick_column(row, "housenumber"),
+                pick_column(row, "zip_code"), pick_column(row, "city"), lat, lng
+            )
+            if record:
+                yield record
+
+
+def read_geojsonseq_records(path: str) -> Iterator[AddressRecord]:
+    """
+    Reads line-delimited GeoJSON features with addr:* tags, e.g. the output of
+    `osmium export -f geojsonseq --geometry-types=point,polygon extract.osm.pbf`.
+    Polygons (buildings) are reduced to the mean of their outer ring.
+    """
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip().lstrip("\x1e")
+            if not line:
+                continue
+            feature = json.loads(line)
+            properties = feature.get("properties") or {}
+            geometry = feature.get("geometry") or {}
+
+            if geometry.get("type") == "Point":
+                lng, lat = geometry["coordinates"][:2]
+            elif geometry.get("type") == "Polygon":
+                lng, lat = np.asarray(geometry["coordinates"][0], dtype=float)[:, :2].mean(axis=0)
+            else:
+                continue
+
+            record = make_record(
+                properties.get("addr:street", ""), properties.get("addr:housenumber", ""),
+                properties.get("addr:postcode", ""), properties.get("addr:city", ""), float(lat), float(lng)
+            )
+            if record:
+                yield record
+
+
+def read_address_records(path: str) -> Iterator[AddressRecord]:
+    if path.endswith(".csv"):
+        return read_csv_records(path)
+    if path.endswith((".geojsonseq", ".geojsonl", ".geojson")):
+        return read_geojsonseq_records(path)
+    raise ValueError(f"Unsupported address extract: {path} (expected .csv or .geojsonseq)")
+
+
+def encode_strings(strings: List[str]) -> np.ndarray:
+    return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+
+def decode_strings(data: np.ndarray) -> List[str]:
+    return data.tobytes().decode("utf-8").split("\n")
+
+
+class LocalAddressIndex:
+    """
+    Address index for offline geocoding. On disk the strings are stored once in string tables and every
+    address is a row of table ids plus a float32 coordinate, in memory it is a set of dictionaries.
+    """
+
+    def __init__(
+        self,
+        tables: Dict[str, List[str]],
+        rows: np.ndarray,
+        coordinates: np.ndarray,
+        zip_centroids: np.ndarray
+    ):
+        self.tables = tables
+        self.rows = rows
+        self.coordinates = coordinates
+        self.zip_centroids = zip_centroids
+
+        street_names, housenumbers = tables["street_names"], tables["housenumbers"]
+        zip_codes, cities = tables["zip_codes"], tables["cities"]
+
+        # zip code -> street name -> house number -> row
+        self.streets_by_zip: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self.zips_by_city: Dict[str, set] = {}
+        self.city_by_zip: Dict[str, str] = {}
+        for row_index, (street_id, housenumber_id, zip_id, city_id) in enumerate(rows.tolist()):
+            zip_code = zip_codes[zip_id]
+            streets = self.streets_by_zip.setdefault(zip_code, {})
+            streets.setdefault(street_names[street_id], {})[housenumbers[housenumber_id]] = row_index
+            self.zips_by_city.setdefault(cities[city_id], set()).add(zip_code)
+            self.city_by_zip.setdefault(zip_code, cities[city_id])
+
+        self.zip_centroid_by_code = {
+            zip_code: (float(lat), float(lng)) for zip_code, (lat, lng) in zip(zip_codes, zip_centroids.tolist())
+        }
+
+    @classmethod
+    def build(cls, records: Iterable[AddressRecord]) -> "LocalAddressIndex":
+        tables: Dict[str, Dict[str, int]] = {"street_names": {}, "housenumbers": {}, "zip_codes": {}, "cities": {}}
+        rows = []
+        coordinates = []
+        seen = set()
+
+        for street_name, housenumber, zip_code, city, lat, lng in records:
+            if (street_name, housenumber, zip_code) in seen:
+                continue
+            seen.add((street_name, housenumber, zip_code))
+            rows.append([
+                tables[table].setdefault(value, len(tables[table]))
+                for table, value in zip(tables, (street_name, housenumber, zip_code, city))
+            ])
+            coordinates.append((lat, lng))
+
+        rows = np.asarray(rows, dtype=np.int32).reshape(-1, 4)
+        coordinates = np.asarray(coordinates, dtype=np.float32).reshape(-1, 2)
+
+        zip_ids = rows[:, 2]
+        counts = np.bincount(zip_ids, minlength=len(tables["zip_codes"]))
+        zip_centroids = np.stack([
+            np.bincount(zip_ids, weights=coordinates[:, axis], minlength=len(counts)) / np.maximum(counts, 1)
+            for axis in (0, 1)
+        ], axis=1).astype(np.float32)
+
+        return cls({table: list(values) for table, values in tables.items()}, rows, coordinates, zip_centroids)
+
+    def save(self, path: str):
+        np.savez_compressed(
+            path,
+            rows=self.rows,
+            coordinates=self.coordinates,
+            zip_centroids=self.zip_centroids,
+            **{table: encode_strings(values) for table, values in self.tables.items()}
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LocalAddressIndex":
+        with np.load(path) as data:
+            tables = {table: decode_strings(data[table]) for table in ("street_names", "housenumbers", "zip_codes", "cities")}
+            return cls(tables, data["rows"], data["coordinates"], data["zip_centroids"])
+
+    def find_street(self, street_name: str, zip_code: str, city: str) -> Optional[StreetMatch]:
+        """
+        Returns the street found with its house numbers. The street is looked up in the zip code or, if the zip code
+        is unknown, in all zip codes of the city. Otherwise street, zip code and city are matched fuzzily.
+        """
+        if zip_code in self.streets_by_zip:
+            candidate_zips = [zip_code]
+        else:
+            candidate_zips = sorted(self.zips_by_city.get(city, ()))
+
+        for candidate_zip in candidate_zips:
+            housenumbers = self.streets_by_zip[candidate_zip].get(street_name)
+            if housenumbers is not None:
+                return StreetMatch(street_name, candidate_zip, housenumbers)
+
+        return self.find_street_fuzzy(street_name, zip_code, city)
+
+    def find_street_fuzzy(self, street_name: str, zip_code: str, city: str) -> Optional[StreetMatch]:
+        """
+        Searches the zip codes similar to the given one and the zip codes of the given or a similar city.
+        Every street within FUZZY_STREET_CUTOFF of the street name is ranked by the weighted similarity
+        of street, zip code and city, so a typo in the zip code or city does not hide the street.
+        """
+        candidate_zips = set(difflib.get_close_matches(zip_code, self.streets_by_zip, n=5, cutoff=FUZZY_ZIP_CUTOFF))
+        for candidate_city in difflib.get_close_matches(city, self.zips_by_city, n=3, cutoff=FUZZY_CITY_CUTOFF):
+            candidate_zips.update(self.zips_by_city[candidate_city])
+
+        street_weight, zip_weight, city_weight = FUZZY_WEIGHTS
+        best_score, best_match = 0.0, None
+        for candidate_zip in sorted(candidate_zips):
+            streets = self.streets_by_zip[candidate_zip]
+            zip_score = difflib.SequenceMatcher(None, zip_code, candidate_zip).ratio()
+            city_score = difflib.SequenceMatcher(None, city, self.city_by_zip[candidate_zip]).ratio()
+            for name in difflib.get_close_matches(street_name, streets, n=3, cutoff=FUZZY_STREET_CUTOFF):
+                street_score = difflib.SequenceMatcher(None, street_name, name).ratio()
+                score = street_weight * street_score + zip_weight * zip_score + city_weight * city_score
+                if score > best_score:
+                    best_score, best_match = score, StreetMatch(name, candidate_zip, streets[name])
+
+        return best_match
+
+
+class LocalGeocoder:
+    is_remote = False
+
+    def __init__(self, index: LocalAddressIndex):
+        self.index = index
+
+    def geocode(self, street: str, zip_code: str, city: str) -> EnhancedAddressResponse:
+        full_address = f"{street}, {zip_code} {city}"
+        street_name, housenumber = split_housenumber(normalize_text(street))
+        normalized_zip = normalize_text(zip_code)
+
+        match = self.index.find_street(street_name, normalized_zip, normalize_text(city))
+        housenumbers = match.housenumbers if match is not None else None
+
+        if housenumbers is not None and housenumber in housenumbers:
+            lat, lng = self.index.coordinates[housenumbers[housenumber]].tolist()
+            if match.street_name == street_name and match.zip_code == normalized_zip:
+                error_information = None
+            elif match.street_name == street_name and normalized_zip not in self.index.streets_by_zip:
+                error_information = f"Zip code not found in local address index, matched by city: {full_address}"
+            else:
+                # Fuzzy match, the user should confirm the corrected address
+                error_information = (
+                    f"Address not found exactly in local address index, matched "
+                    f"'{match.street_name} {housenumber}, {match.zip_code}': {full_address}"
+                )
+            return EnhancedAddressResponse(
+                could_be_fully_found=error_information is None,
+                error_information=error_information,
+                street=street,
+                zipcode=zip_code,
+                city=city,
+                latitude=lat,
+                longitude=lng
+            )
+
+        if housenumbers is not None:
+            lat, lng = self.index.coordinates[list(housenumbers.values())].mean(axis=0).tolist()
+            return EnhancedAddressResponse(
+                could_be_fully_found=False,
+                error_information=f"House number not found in local address index, using street center: {full_address}",
+                street=street,
+                zipcode=zip_code,
+                city=city,
+                latitude=lat,
+                longitude=lng
+            )
+
+        if normalized_zip in self.index.zip_centroid_by_code:
+            lat, lng = self.index.zip_centroid_by_code[normalized_zip]
+            return EnhancedAddressResponse(
+                could_be_fully_found=False,
+                error_information=f"Street not found in local address index, using zip code center: {full_address}",
+                street=street,
+                zipcode=zip_code,
+                city=city,
+                latitude=lat,
+                longitude=lng
+            )
+
+        return EnhancedAddressResponse(
+            could_be_fully_found=False,
+            error_information=f"Address could not be found in local address index: {full_address}",
+            street=street,
+            zipcode=zip_code,
+            city=city
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local geocoder index from an address extract")
+    parser.add_argument("extract", help="CSV file or line-delimited GeoJSON exported from OSM")
+    parser.add_argument("index", help="Output file (.npz), used as LOCAL_GEOCODER_INDEX")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = LocalAddressIndex.build(read_address_records(args.extract))
+    index.save(args.index)
+    print(f"Indexed {len(index.rows)} addresses in {len(index.zip_centroids)} zip codes "
+          f"in {time.perf_counter() - started:.1f}s")
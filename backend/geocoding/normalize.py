@@ -0,0 +1,32 @@
+import re
+import unicodedata
+from typing import Tuple
+
+HOUSENUMBER_PATTERN = re.compile(r"^(.*?)\s*(\d+[a-z]?(?:\s*[-/]\s*\d+[a-z]?)?)$")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()  # casefold also maps ß to ss
+    text = re.sub(r"[.,;]", " ", text)
+    text = re.sub(r"strasse\b", "str", text)
+    text = re.sub(r"(\d)\s+([a-z])\b", r"\1\2", text)  # house numbers like "3 a" -> "3a"
+    return " ".join(text.split())
+
+
+def normalize_address(street: str, zip_code: str, city: str) -> str:
+    """
+    Builds a lookup key under which spelling variants of the same address collapse,
+    e.g. "Görlitzer Straße 3" and "görlitzer str. 3".
+    """
+    return "|".join(normalize_text(part) for part in (street, zip_code, city))
+
+
+def split_housenumber(normalized_street: str) -> Tuple[str, str]:
+    """
+    Splits a normalized street like "görlitzer str 3a" into ("görlitzer str", "3a").
+    The house number is empty if the street does not end with one.
+    """
+    match = HOUSENUMBER_PATTERN.match(normalized_street)
+    if not match:
+        return normalized_street, ""
+    return match.group(1), match.group(2).replace(" ", "")
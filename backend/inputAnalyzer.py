@@ -1,11 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
 from datetime import datetime
 
-from distance_matrix import get_distance_matrix_2d
+from broker.cache import cache_get, cache_set
+from distance_matrix import get_time_bucket_starts
+from geocoding.backend import get_geocoder
+from geocoding.normalize import normalize_address
+from matrix_cache import get_matrix_set, prefetch_matrix_set
 from solver.models import *
 from fastapi import HTTPException
 import exceptionStrings
+import json
 import os
-import requests
+
+# Upper bound for concurrent geocoding requests, shared by all callers of geocode_addresses
+GEOCODING_MAX_WORKERS = int(os.getenv("GEOCODING_MAX_WORKERS", "16"))
+geocoding_executor = ThreadPoolExecutor(max_workers=GEOCODING_MAX_WORKERS, thread_name_prefix="geocoding")
+# Start building the matrix between validated appointments before the solve request arrives
+MATRIX_PREFETCH = os.getenv("MATRIX_PREFETCH", "1") == "1"
 
 def parse_datetime(dt_str: str) -> datetime:
     # Support ISO8601 with or without timezone Z or offset
@@ -25,112 +37,88 @@ def parse_datetime(dt_str: str) -> datetime:
     # Raise if parsing failed
     raise ValueError(f"Invalid datetime format: {original}")
 
-def validate_single_address_with_google_maps(street: str, zip_code: str, city: str) -> EnhancedAddressResponse:
-    assert isinstance(street, str), "street must be a string"
-    assert isinstance(zip_code, str), "zip_code must be a string"
-    assert isinstance(city, str), "city must be a string"
-
-    api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-    print("API Key:", api_key)  # Debugging line to check if the API key is loaded
-    if not api_key:
-        raise RuntimeError("GOOGLE_MAPS_API_KEY is not set in environment variables")
-
-    full_address = f"{street}, {zip_code} {city}"
-    params = {
-        "address": full_address,
-        "key": api_key
-    }
-
-    response = requests.get("https://maps.googleapis.com/maps/api/geocode/json", params=params)
-
-    if response.status_code != 200:
-        return EnhancedAddressResponse(
-            could_be_fully_found=False,
-            error_information=f"Error contacting Google Maps API for address: {full_address}",
-            street=street,
-            zipcode=zip_code,
-            city=city
-        )
-
-    data = response.json()
-
-    print("Google Maps API Response:", data)
-
-    if not data.get("results"):
-        return EnhancedAddressResponse(
-            could_be_fully_found=False,
-            error_information=f"Address could not be found using Google Maps API: {full_address}",
-            street=street,
-            zipcode=zip_code,
-            city=city
-        )
-
-    result = data["results"][0]
-    if result.get("partial_match"):
-        return EnhancedAddressResponse(
-            could_be_fully_found=False,
-            error_information=f"Address was only partially recognized — possibly invalid: {full_address}",
-            street=street,
-            zipcode=zip_code,
-            city=city,
-            latitude=result["geometry"]["location"]["lat"],
-            longitude=result["geometry"]["location"]["lng"]
-        )
-
-    return EnhancedAddressResponse(
-        could_be_fully_found=True,
-        error_information=None,
-        street=street,
-        zipcode=zip_code,
-        city=city,
-        latitude=result["geometry"]["location"]["lat"],
-        longitude=result["geometry"]["location"]["lng"]
-    )
+def geocode_addresses(addresses: List[Address]) -> List[EnhancedAddressResponse]:
+    """
+    Geocodes a batch of addresses. Addresses are normalized and deduplicated first, the unique ones are
+    resolved (concurrently for remote geocoders) and the results are mapped back in input order
+    with the original spelling.
+    """
+    geocoder = get_geocoder()
+    keys = [normalize_address(address.street, address.zip_code, address.city) for address in addresses]
+
+    unique_addresses = {}
+    for key, address in zip(keys, addresses):
+        unique_addresses.setdefault(key, address)
+
+    # Addresses resolved before, by any node sharing the broker
+    resolved = {}
+    for key in unique_addresses:
+        cached = cache_get(f"geocode:{key}")
+        if cached is not None:
+            resolved[key] = EnhancedAddressResponse(**json.loads(cached))
+    missing = {key: address for key, address in unique_addresses.items() if key not in resolved}
+
+    if geocoder.is_remote:
+        futures = {
+            key: geocoding_executor.submit(geocoder.geocode, address.street, address.zip_code, address.city)
+            for key, address in missing.items()
+        }
+        geocoded = {key: future.result() for key, future in futures.items()}
+    else:
+        geocoded = {
+            key: geocoder.geocode(address.street, address.zip_code, address.city)
+            for key, address in missing.items()
+        }
+
+    for key, response in geocoded.items():
+        # Failures can be temporary (quota, network), only found addresses are shared
+        if response.could_be_fully_found:
+            cache_set(f"geocode:{key}", json.dumps(asdict(response)).encode())
+    resolved.update(geocoded)
+
+    return [
+        replace(resolved[key], street=address.street, zipcode=address.zip_code, city=address.city)
+        for key, address in zip(keys, addresses)
+    ]
 
 
 def validate_company_info(company_info: CompanyInfo)-> AppointmentValidationResponse:
     errors = []
-    address_responses = []
 
     if not company_info.number_of_workers:
         errors.append(exceptionStrings.NUMBER_OF_WORKERS_INVALID)
 
-    start = company_info.start_address
-    if not start.street.strip() or not start.zip_code.strip() or not start.city.strip():
-        errors.append(exceptionStrings.START_ADDRESS_EMPTY)
-        address_responses.append(
-            EnhancedAddressResponse(
-                could_be_fully_found=False,
-                error_information = exceptionStrings.START_ADDRESS_EMPTY,
-                street=start.street,
-                zipcode=start.zip_code,
-                city=start.city,
-                latitude=None,
-                longitude=None
-            )
-        )
-    else:
-        start_address_response = validate_single_address_with_google_maps(start.street, start.zip_code, start.city)
-        address_responses.append(start_address_response)
+    # Start and finish address are geocoded in one batch, so identical addresses are only resolved once
+    checked_addresses = [
+        (company_info.start_address, exceptionStrings.START_ADDRESS_EMPTY),
+        (company_info.finish_address, exceptionStrings.FINISH_ADDRESS_EMPTY),
+    ]
+    is_filled = [
+        bool(address.street.strip() and address.zip_code.strip() and address.city.strip())
+        for address, _ in checked_addresses
+    ]
+    geocoded = iter(geocode_addresses([
+        address for (address, _), filled in zip(checked_addresses, is_filled) if filled
+    ]))
+
+    address_responses = []
+    for (address, empty_error), filled in zip(checked_addresses, is_filled):
+        if filled:
+            address_responses.append(next(geocoded))
+            continue
 
-    # Google Maps Validierung für die Zieladresse
-    finish = company_info.finish_address
-    if not finish.street.strip() or not finish.zip_code.strip() or not finish.city.strip():
-        errors.append(exceptionStrings.FINISH_ADDRESS_EMPTY)
+        errors.append(empty_error)
         address_responses.append(
             EnhancedAddressResponse(
                 could_be_fully_found=False,
-                error_information=exceptionStrings.FINISH_ADDRESS_EMPTY,
-                street=finish.street,
-                zipcode=finish.zip_code,
-                city=finish.city,
+                error_information=empty_error,
+                street=address.street,
+                zipcode=address.zip_code,
+                city=address.city,
                 latitude=None,
                 longitude=None
             )
         )
-    else:
-        finish_address_response = validate_single_address_with_google_maps(finish.street, finish.zip_code, finish.city)
-        address_responses.append( finish_address_response)
 
     all_valid = len(errors) == 0
 
@@ -142,70 +130,57 @@ def validate_company_info(company_info: CompanyInfo)-> AppointmentValidationResp
 
 
 def validate_appointments(appointments: List[Appointment]) -> AppointmentValidationResponse:
-    errors = []
-    address_responses = []
-    all_valid = True  # will be set False as soon as the first address is not valid
+    # Errors are collected per appointment, so that the address errors of the batch geocoding
+    # end up in the same order as if the appointments were checked one after another
+    appointment_errors: List[List[str]] = []
+    geocoded_appointments = []
 
     for appointment in appointments:
+        current_errors = []
+        appointment_errors.append(current_errors)
 
         try:
             start = parse_datetime(appointment.appointment_start)
             end = parse_datetime(appointment.appointment_end)
         except ValueError:
-            errors.append(exceptionStrings.APPOINTMENT_START_INVALID)
-            all_valid = False
+            current_errors.append(exceptionStrings.APPOINTMENT_START_INVALID)
             continue
 
         if start > end:
-            errors.append(exceptionStrings.APPOINTMENT_END_BEFORE_START)
-            all_valid = False
+            current_errors.append(exceptionStrings.APPOINTMENT_END_BEFORE_START)
 
         appointment_duration = (end - start).total_seconds() / 3600  # duration in hours
         appointment_max_duration = 24  # wahrscheinlich wird diese Ausnahme hauptsächlich durch Tippfehler in der Endzeit verursacht
         if appointment_duration > appointment_max_duration:
-            errors.append(exceptionStrings.APPOINTMENT_DURATION_TOO_LONG)
-            all_valid = False
+            current_errors.append(exceptionStrings.APPOINTMENT_DURATION_TOO_LONG)
 
         if not appointment.address.street.strip():
-            errors.append(exceptionStrings.APPOINTMENT_STREET_EMPTY)
-            all_valid = False
+            current_errors.append(exceptionStrings.APPOINTMENT_STREET_EMPTY)
         if not appointment.address.zip_code.strip():
-            errors.append(exceptionStrings.APPOINTMENT_ZIPCODE_EMPTY)
-            all_valid = False
+            current_errors.append(exceptionStrings.APPOINTMENT_ZIPCODE_EMPTY)
 
         if not appointment.address.city.strip():
-            errors.append(exceptionStrings.APPOINTMENT_CITY_EMPTY)
-            all_valid = False
+            current_errors.append(exceptionStrings.APPOINTMENT_CITY_EMPTY)
 
         if appointment.number_of_workers < 1:
-            errors.append(exceptionStrings.NUMBER_OF_WORKERS_INVALID)
-            all_valid = False
+            current_errors.append(exceptionStrings.NUMBER_OF_WORKERS_INVALID)
 
-        address_info = validate_single_address_with_google_maps(
-            appointment.address.street,
-            appointment.address.zip_code,
-            appointment.address.city
-        )
+        geocoded_appointments.append((appointment, current_errors))
 
-        address_responses.append(address_info)
+    address_responses = geocode_addresses([appointment.address for appointment, _ in geocoded_appointments])
 
+    for (appointment, current_errors), address_info in zip(geocoded_appointments, address_responses):
         if not address_info.could_be_fully_found:
             error_message = f"{exceptionStrings.ADDRESS_NOT_FOUND_WITH_GOOGLE}: {address_info.error_information}"
 
             error_message += f" Address: {address_info.street}, {address_info.zipcode}, {address_info.city}"
 
-            errors.append(error_message)
-            all_valid = False
+            current_errors.append(error_message)
 
-    if errors:
-        return AppointmentValidationResponse(
-            all_valid = False,
-            errors = errors,
-            address_responses = address_responses
-        )
+    errors = [error for current_errors in appointment_errors for error in current_errors]
 
     return AppointmentValidationResponse(
-        all_valid = all_valid,
+        all_valid = not errors,
         errors = errors,
         address_responses = address_responses
     )
@@ -258,6 +233,17 @@ def convert_to_locations(address_responses: list[EnhancedAddressResponse]) -> li
     return locations
 
 
+def prefetch_appointment_matrix(appointments: List[Appointment], validation_response: AppointmentValidationResponse):
+    """
+    Starts building the matrix between the validated appointments in the background. The later
+    check_and_enhance_optimization_request only has to add the depot row and column to it.
+    """
+    if not MATRIX_PREFETCH or not appointments or not validation_response.all_valid:
+        return
+    locations = convert_to_locations(validation_response.address_responses)
+    prefetch_matrix_set(locations, parse_datetime(appointments[0].appointment_start).date())
+
+
 def convert_to_enhanced_appointment(appointment: Appointment,location:Location) -> EnhancedAppointment:
 
     enhanced_appointment = EnhancedAppointment(
@@ -265,7 +251,8 @@ def convert_to_enhanced_appointment(appointment: Appointment,location:Location)
         appointment_end=appointment.appointment_end,
         address=appointment.address,
         location=location,
-        number_of_workers=appointment.number_of_workers
+        number_of_workers=appointment.number_of_workers,
+        required_skills=appointment.required_skills
     )
 
     return enhanced_appointment
@@ -309,20 +296,28 @@ def check_and_enhance_optimization_request(opti_request:OptimizationRequest) ->
     locations = [depot_location[0]] + locations
 
 
-    distance_matrix_response = get_distance_matrix_2d(locations)
-    duration_matrix = distance_matrix_response.duration_matrix
-    distance_matrix = distance_matrix_response.distance_matrix
+    day = parse_datetime(appointments[0].appointment_start).date() if appointments else None
+    distance_matrix, time_matrices = get_matrix_set(locations, day)
+
+    # The parts are validated already and the matrices come from our own providers,
+    # model_construct skips validating every matrix entry again
+    bucket_starts = get_time_bucket_starts()
+    if bucket_starts:
+        # One duration matrix per departure time bucket; the static matrix is the slowest of them
+        return EnhancedOptimizationRequest.model_construct(
+            company_info=company_info,
+            appointments=enhanced_appointments,
+            time_matrix = to_int_array(time_matrices.max(axis=0)),
+            distance_matrix = to_int_array(distance_matrix),
+            time_matrix_buckets = bucket_starts,
+            time_matrices = to_int_array(time_matrices)
+        )
 
-    enhanced_opti_request = EnhancedOptimizationRequest(
+    enhanced_opti_request = EnhancedOptimizationRequest.model_construct(
         company_info=company_info,
         appointments=enhanced_appointments,
-        time_matrix = duration_matrix,
-        distance_matrix = distance_matrix
+        time_matrix = to_int_array(time_matrices[0]),
+        distance_matrix = to_int_array(distance_matrix)
     )
 
     return enhanced_opti_request
-
-
-
-
-
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Optional, Tuple
+
+from broker.base import get_broker
+from broker.cache import cache_get, cache_set
+from scheduler import PRIORITY_CLASSES
+from solver.models import EnhancedOptimizationRequest, JobStatus, Solution
+
+SOLVE_QUEUE = "solve"
+# One queue per priority class, workers take jobs from the most urgent non-empty queue first
+SOLVE_QUEUES = [f"{SOLVE_QUEUE}:{priority}" for priority in sorted(PRIORITY_CLASSES.values())]
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "86400"))
+
+
+def solution_cache_key(payload: bytes) -> str:
+    # Identical requests (same appointments, fleet and matrices) have the same solution
+    return "solution:" + hashlib.sha256(payload).hexdigest()
+
+
+def save_job_status(status: JobStatus):
+    get_broker().set(f"job:{status.job_id}", status.model_dump_json().encode(), JOB_TTL_SECONDS)
+
+
+def get_job_status(job_id: str) -> Optional[JobStatus]:
+    data = get_broker().get(f"job:{job_id}")
+    return JobStatus.model_validate_json(data) if data is not None else None
+
+
+def submit_solve_job(
+    request: EnhancedOptimizationRequest,
+    tenant: str,
+    priority: int,
+    latency_target_ms: int,
+    arrived_at: float
+) -> JobStatus:
+    """
+    Queues the request for the solver workers (python -m worker). A request that was solved before
+    is answered from the shared solution cache without queueing it again.
+    The solve options travel with the job, the deadline counts from arrived_at (time.monotonic()).
+    """
+    request_data = request.model_dump_json().encode()
+    job_id = uuid.uuid4().hex
+
+    cached_solution = cache_get(solution_cache_key(request_data))
+    if cached_solution is not None:
+        status = JobStatus(job_id=job_id, status="done", solution=Solution.model_validate_json(cached_solution))
+        save_job_status(status)
+        return status
+
+    # Wall clock time, monotonic clocks are not comparable between machines
+    options = {
+        "tenant": tenant,
+        "priority": priority,
+        "latency_target_ms": latency_target_ms,
+        "submitted_at": time.time() - (time.monotonic() - arrived_at),
+    }
+    status = JobStatus(job_id=job_id, status="queued")
+    save_job_status(status)
+    get_broker().enqueue(SOLVE_QUEUES[priority], job_id, json.dumps(options).encode() + b"\n" + request_data)
+    return status
+
+
+def read_job_payload(payload: bytes) -> Tuple[dict, bytes]:
+    options, request_data = payload.split(b"\n", 1)
+    return json.loads(options), request_data
+
+
+def run_solve_job(job_id: str, payload: bytes):
+    """
+    Solves a job through the same admission path as the API (SolveScheduler): the time limit fits the
+    deadline of the job and tenant quotas apply.
+    """
+    from scheduler import solve_scheduler
+
+    save_job_status(JobStatus(job_id=job_id, status="running"))
+    try:
+        options, request_data = read_job_payload(payload)
+        solution = solve_scheduler.run(
+            EnhancedOptimizationRequest.model_validate_json(request_data),
+            options["tenant"],
+            options["priority"],
+            options["latency_target_ms"],
+            arrived_at=time.monotonic() - (time.time() - options["submitted_at"])
+        )
+    except Exception as e:
+        save_job_status(JobStatus(job_id=job_id, status="failed", error=str(e)))
+        return
+
+    # Only complete solutions are cached, a timed out search may do better next time
+    if solution.routes:
+        cache_set(solution_cache_key(request_data), solution.model_dump_json().encode())
+    save_job_status(JobStatus(job_id=job_id, status="done", solution=solution))
@@ -0,0 +1,214 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from broker.cache import cache_get, cache_set
+from distance_matrix import build_matrix_set, get_time_bucket_starts
+from solver.models import Location
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Matrices are built in the background as soon as the locations are known and stored as futures
+# under a content hash, so a later request can pick up a finished or still running build.
+MATRIX_CACHE_SIZE = int(os.getenv("MATRIX_CACHE_SIZE", "32"))
+MATRIX_PREFETCH_WORKERS = int(os.getenv("MATRIX_PREFETCH_WORKERS", "2"))
+
+matrix_executor = ThreadPoolExecutor(max_workers=MATRIX_PREFETCH_WORKERS, thread_name_prefix="matrix-prefetch")
+matrix_futures: "OrderedDict[str, Future]" = OrderedDict()
+matrix_futures_lock = threading.Lock()
+
+# (distance matrix in meters, duration matrices in minutes with shape (buckets, n, n))
+MatrixSet = Tuple["np.ndarray", "np.ndarray"]
+
+
+def matrix_cache_key(locations: List[Location], day: Optional[date], bucket_starts: List[int]) -> str:
+    # Content hash of the coordinates (not the ids), so the same places always share an entry.
+    # Static matrices do not depend on the day, time dependent ones on its weekday.
+    content = json.dumps({
+        "coordinates": [[round(loc.lat, 6), round(loc.lng, 6)] for loc in locations],
+        "provider": os.getenv("MATRIX_PROVIDER", "google").lower(),
+        "weekday": day.weekday() if bucket_starts and day else None,
+        "buckets": bucket_starts,
+    })
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def store_matrix_future(key: str, future: Future):
+    matrix_futures[key] = future
+    matrix_futures.move_to_end(key)
+    while len(matrix_futures) > MATRIX_CACHE_SIZE:
+        matrix_futures.popitem(last=False)
+
+
+def lookup_matrix_future(key: str) -> Optional[Future]:
+    with matrix_futures_lock:
+        future = matrix_futures.get(key)
+        if future is None:
+            return None
+        if future.done() and future.exception() is not None:
+            # Failed builds are not cached, the next request tries again
+            del matrix_futures[key]
+            return None
+        matrix_futures.move_to_end(key)
+        return future
+
+
+def dump_matrix_set(matrix_set: MatrixSet) -> bytes:
+    import numpy as np
+
+    distance_matrix, time_matrices = matrix_set
+    shared = time_matrices.strides[0] == 0
+    buffer = io.BytesIO()
+    # A broadcast stack is stored as its single matrix
+    np.savez(
+        buffer,
+        distance_matrix=distance_matrix,
+        time_matrices=time_matrices[:1] if shared else time_matrices,
+        buckets=np.array(time_matrices.shape[0]),
+        shared=np.array(shared)
+    )
+    return buffer.getvalue()
+
+
+def load_matrix_set(data: bytes) -> MatrixSet:
+    import numpy as np
+
+    with np.load(io.BytesIO(data)) as archive:
+        time_matrices = archive["time_matrices"]
+        if archive["shared"]:
+            time_matrices = np.broadcast_to(time_matrices[0], (int(archive["buckets"]),) + time_matrices.shape[1:])
+        return archive["distance_matrix"], time_matrices
+
+
+def load_or_build_matrix_set(
+    key: str,
+    locations: List[Location],
+    day: Optional[date],
+    bucket_starts: List[int]
+) -> MatrixSet:
+    """
+    Looks the matrices up in the cache shared by all nodes before fetching them from the provider.
+    """
+    cached = cache_get(f"matrix:{key}")
+    if cached is not None:
+        return load_matrix_set(cached)
+    matrix_set = build_matrix_set(locations, locations, day, bucket_starts)
+    cache_set(f"matrix:{key}", dump_matrix_set(matrix_set))
+    return matrix_set
+
+
+def prefetch_matrix_set(locations: List[Location], day: Optional[date]) -> Future:
+    """
+    Starts building the matrices for the locations in the background unless a build already exists.
+    """
+    bucket_starts = get_time_bucket_starts()
+    key = matrix_cache_key(locations, day, bucket_starts)
+
+    existing = lookup_matrix_future(key)
+    if existing is not None:
+        return existing
+
+    with matrix_futures_lock:
+        if key not in matrix_futures:
+            store_matrix_future(
+                key, matrix_executor.submit(load_or_build_matrix_set, key, locations, day, bucket_starts)
+            )
+        return matrix_futures[key]
+
+
+def combine_blocks(depot_row: "np.ndarray", depot_column: "np.ndarray", appointment_block: "np.ndarray") -> "np.ndarray":
+    """
+    Assembles [[depot row], [depot column, appointment block]] along the last two axes.
+    """
+    import numpy as np
+
+    size = appointment_block.shape[-1] + 1
+    dtype = np.result_type(depot_row, depot_column, appointment_block)
+    combined = np.empty(appointment_block.shape[:-2] + (size, size), dtype=dtype)
+    combined[..., 0, :] = depot_row[..., 0, :]
+    combined[..., 1:, 0] = depot_column[..., :, 0]
+    combined[..., 1:, 1:] = appointment_block
+    return combined
+
+
+def extend_with_depot(
+    locations: List[Location],
+    day: Optional[date],
+    bucket_starts: List[int],
+    appointment_set: MatrixSet
+) -> MatrixSet:
+    """
+    Builds the matrices for [depot] + appointments from the matrices between the appointments,
+    so only the depot row and column (2n elements) have to be fetched.
+    """
+    import numpy as np
+
+    depot, appointments = locations[0], locations[1:]
+    row_distances, row_durations = build_matrix_set([depot], locations, day, bucket_starts)
+    column_distances, column_durations = build_matrix_set(appointments, [depot], day, bucket_starts)
+    appointment_distances, appointment_durations = appointment_set
+
+    distance_matrix = combine_blocks(row_distances, column_distances, appointment_distances)
+    if all(durations.strides[0] == 0 for durations in (row_durations, column_durations, appointment_durations)):
+        # All buckets share one matrix (no traffic data), so the stack stays a broadcast view
+        static = combine_blocks(row_durations[0], column_durations[0], appointment_durations[0])
+        return distance_matrix, np.broadcast_to(static, (appointment_durations.shape[0],) + static.shape)
+    return distance_matrix, combine_blocks(row_durations, column_durations, appointment_durations)
+
+
+def get_matrix_set(locations: List[Location], day: Optional[date]) -> MatrixSet:
+    """
+    Returns the matrices for the locations (depot first). A finished or running build for the same
+    locations is reused. If only the appointments were prefetched, the depot is added to them.
+    """
+    bucket_starts = get_time_bucket_starts()
+    key = matrix_cache_key(locations, day, bucket_starts)
+
+    future = lookup_matrix_future(key)
+    if future is None:
+        cached = cache_get(f"matrix:{key}")
+        if cached is not None:
+            future = Future()
+            future.set_result(load_matrix_set(cached))
+            with matrix_futures_lock:
+                store_matrix_future(key, future)
+    if future is None and len(locations) > 1:
+        appointment_future = lookup_matrix_future(matrix_cache_key(locations[1:], day, bucket_starts))
+        if appointment_future is not None:
+            try:
+                appointment_set = appointment_future.result()
+            except Exception:
+                appointment_set = None
+            if appointment_set is not None:
+                matrix_set = extend_with_depot(locations, day, bucket_starts, appointment_set)
+                cache_set(f"matrix:{key}", dump_matrix_set(matrix_set))
+                future = Future()
+                future.set_result(matrix_set)
+                with matrix_futures_lock:
+                    store_matrix_future(key, future)
+
+    if future is not None:
+        return future.result()
+
+    # Nothing prefetched: build in the calling thread instead of queueing behind speculative builds.
+    # The future is stored first, so concurrent requests for the same locations wait for this build.
+    with matrix_futures_lock:
+        future = matrix_futures.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            store_matrix_future(key, future)
+
+    if is_owner:
+        try:
+            future.set_result(load_or_build_matrix_set(key, locations, day, bucket_starts))
+        except Exception as e:
+            future.set_exception(e)
+    return future.result()
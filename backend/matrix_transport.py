@@ -0,0 +1,137 @@
+import io
+import json
+import uuid
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+from solver.models import EnhancedOptimizationRequest
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Matrices can be sent as multipart/form-data instead of nested JSON lists.
+# Every matrix part is either a .npy file or raw little-endian int32 values in row-major order.
+MULTIPART_CONTENT_TYPE = "multipart/form-data"
+NPY_MAGIC = b"\x93NUMPY"
+RAW_MATRIX_DTYPE = "<i4"
+
+
+def is_multipart_request(request: Request) -> bool:
+    return request.headers.get("content-type", "").startswith(MULTIPART_CONTENT_TYPE)
+
+
+def accepts_multipart(request: Request) -> bool:
+    return MULTIPART_CONTENT_TYPE in request.headers.get("accept", "")
+
+
+def load_matrix(data: bytes, expected_shape: Tuple[int, ...]) -> "np.ndarray":
+    """
+    Wraps the received bytes of a matrix part in a NumPy array of the expected shape without copying them.
+    """
+    import numpy as np
+
+    offset = 0
+    dtype = np.dtype(RAW_MATRIX_DTYPE)
+    fortran_order = False
+    shape = expected_shape
+
+    if data.startswith(NPY_MAGIC):
+        header = io.BytesIO(data)
+        version = np.lib.format.read_magic(header)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+        offset = header.tell()
+
+    if dtype.kind not in "iu":
+        raise ValueError(f"Matrix must contain integers, got dtype {dtype}")
+    if tuple(shape) != expected_shape:
+        raise ValueError(f"Matrix must have shape {expected_shape}, got {tuple(shape)}")
+    count = int(np.prod(expected_shape))
+    if len(data) - offset != count * dtype.itemsize:
+        raise ValueError(f"Matrix has {len(data) - offset} bytes, expected {count * dtype.itemsize}")
+
+    matrix = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+    return matrix.reshape(shape, order="F" if fortran_order else "C")
+
+
+async def read_file_part(form, name: str) -> bytes:
+    part = form[name]
+    if isinstance(part, str):
+        raise ValueError(f"Multipart part '{name}' must be sent as a file")
+    return await part.read()
+
+
+async def parse_enhanced_optimization_request(request: Request) -> EnhancedOptimizationRequest:
+    """
+    Reads an EnhancedOptimizationRequest from a JSON body or from a multipart body with the parts
+    'request' (JSON without the matrices), 'time_matrix', 'distance_matrix' and optionally
+    'time_matrices' (one matrix per entry of time_matrix_buckets).
+    """
+    if not is_multipart_request(request):
+        return EnhancedOptimizationRequest.model_validate_json(await request.body())
+
+    form = await request.form()
+    for part in ("request", "time_matrix", "distance_matrix"):
+        if part not in form:
+            raise HTTPException(status_code=400, detail=f"Missing multipart part '{part}'")
+
+    request_part = form["request"]
+    try:
+        payload = json.loads(request_part if isinstance(request_part, str) else await request_part.read())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Multipart part 'request' is not valid JSON")
+
+    # Validate the remaining fields first, the appointment count gives the expected matrix shape
+    header = EnhancedOptimizationRequest.model_validate(
+        {**payload, "time_matrix": [], "distance_matrix": [], "time_matrices": None}
+    )
+    size = len(header.appointments) + 1
+    matrices = {}
+
+    try:
+        matrices["time_matrix"] = load_matrix(await read_file_part(form, "time_matrix"), (size, size))
+        matrices["distance_matrix"] = load_matrix(await read_file_part(form, "distance_matrix"), (size, size))
+        if "time_matrices" in form:
+            buckets = len(header.time_matrix_buckets or [])
+            matrices["time_matrices"] = load_matrix(await read_file_part(form, "time_matrices"), (buckets, size, size))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return EnhancedOptimizationRequest.model_validate({**payload, **matrices})
+
+
+def dump_matrix(matrix: "np.ndarray") -> bytes:
+    import numpy as np
+
+    buffer = io.BytesIO()
+    np.lib.format.write_array(buffer, np.ascontiguousarray(matrix), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def multipart_matrix_response(ids: List[str], matrices: Dict[str, "np.ndarray"]) -> Response:
+    """
+    Builds a multipart/form-data response with an 'ids' JSON part and one .npy part per matrix.
+    Browsers can read it with Response.formData().
+    """
+    boundary = uuid.uuid4().hex
+    parts: List[Tuple[bytes, bytes]] = [
+        (b'Content-Disposition: form-data; name="ids"\r\nContent-Type: application/json', json.dumps(ids).encode())
+    ]
+    for name, matrix in matrices.items():
+        headers = (
+            f'Content-Disposition: form-data; name="{name}"; filename="{name}.npy"\r\n'
+            f"Content-Type: application/octet-stream"
+        ).encode()
+        parts.append((headers, dump_matrix(matrix)))
+
+    body = io.BytesIO()
+    for headers, content in parts:
+        body.write(b"--" + boundary.encode() + b"\r\n" + headers + b"\r\n\r\n")
+        body.write(content)
+        body.write(b"\r\n")
+    body.write(b"--" + boundary.encode() + b"--\r\n")
+
+    return Response(content=body.getvalue(), media_type=f"{MULTIPART_CONTENT_TYPE}; boundary={boundary}")
@@ -0,0 +1,30 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response that skips FastAPI's jsonable_encoder when the endpoint returns it directly:
+    pydantic models are serialized by pydantic-core, other content (dicts, lists, NumPy arrays) by orjson,
+    or by the json module if orjson is not installed.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        if orjson is not None:
+            return orjson.dumps(
+                content,
+                default=to_jsonable_python,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            )
+        return json.dumps(content, default=to_jsonable_python, ensure_ascii=False, separators=(",", ":")).encode()
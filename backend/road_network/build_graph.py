@@ -0,0 +1,106 @@
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from road_network.graph import build_road_graph, haversine_meters
+
+# Default speeds in km/h for roads without a usable maxspeed tag
+HIGHWAY_SPEEDS = {
+    "motorway": 110,
+    "motorway_link": 60,
+    "trunk": 90,
+    "trunk_link": 50,
+    "primary": 60,
+    "primary_link": 40,
+    "secondary": 50,
+    "secondary_link": 40,
+    "tertiary": 40,
+    "tertiary_link": 30,
+    "unclassified": 30,
+    "residential": 25,
+    "living_street": 10,
+}
+BLOCKED_ACCESS = {"no", "private", "agricultural", "forestry", "delivery"}
+
+
+def parse_maxspeed(value: str, default: float) -> float:
+    try:
+        return float(value.split()[0])
+    except (ValueError, IndexError):
+        return default
+
+
+def read_osm_roads(pbf_path: str):
+    """
+    Reads the drivable ways of an OSM extract. Returns node coordinates (lat, lng) and the directed edges
+    with their travel time in seconds and length in meters.
+    """
+    try:
+        import osmium
+    except ImportError:
+        raise RuntimeError("Reading OSM extracts requires pyosmium: pip install osmium")
+
+    node_ids: Dict[int, int] = {}
+    coordinates: List[List[float]] = []
+    edge_lists: Dict[str, list] = {"sources": [], "targets": [], "speeds": []}
+
+    class RoadHandler(osmium.SimpleHandler):
+        def way(self, way):
+            highway = way.tags.get("highway")
+            if highway not in HIGHWAY_SPEEDS:
+                return
+            if way.tags.get("access") in BLOCKED_ACCESS or way.tags.get("motor_vehicle") in BLOCKED_ACCESS:
+                return
+
+            speed = parse_maxspeed(way.tags.get("maxspeed", ""), HIGHWAY_SPEEDS[highway])
+            oneway = way.tags.get("oneway")
+            forward = oneway != "-1"
+            backward = oneway not in ("yes", "true", "1", "-1") and way.tags.get("junction") != "roundabout"
+            if oneway == "-1":
+                backward = True
+
+            way_nodes = []
+            for node in way.nodes:
+                if not node.location.valid():
+                    return
+                if node.ref not in node_ids:
+                    node_ids[node.ref] = len(coordinates)
+                    coordinates.append([node.location.lat, node.location.lon])
+                way_nodes.append(node_ids[node.ref])
+
+            for a, b in zip(way_nodes, way_nodes[1:]):
+                if forward:
+                    edge_lists["sources"].append(a)
+                    edge_lists["targets"].append(b)
+                    edge_lists["speeds"].append(speed)
+                if backward:
+                    edge_lists["sources"].append(b)
+                    edge_lists["targets"].append(a)
+                    edge_lists["speeds"].append(speed)
+
+    RoadHandler().apply_file(pbf_path, locations=True, idx="flex_mem")
+
+    coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    sources = np.asarray(edge_lists["sources"], dtype=np.int64)
+    targets = np.asarray(edge_lists["targets"], dtype=np.int64)
+    distances = haversine_meters(
+        coordinates[sources, 0], coordinates[sources, 1], coordinates[targets, 0], coordinates[targets, 1]
+    )
+    times = distances / (np.asarray(edge_lists["speeds"]) / 3.6)
+    return coordinates, sources, targets, times, distances
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local routing graph from an OSM extract")
+    parser.add_argument("pbf", help="OSM extract (.osm.pbf), e.g. a city or state from Geofabrik")
+    parser.add_argument("graph_directory", help="Output directory, used as LOCAL_ROUTING_GRAPH")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    coordinates, sources, targets, times, distances = read_osm_roads(args.pbf)
+    print(f"Read {len(coordinates)} nodes and {len(sources)} edges in {time.perf_counter() - started:.1f}s")
+
+    build_road_graph(args.graph_directory, coordinates, sources, targets, times, distances)
+    print(f"Built contraction hierarchy in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,166 @@
+import heapq
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Witness searches stop after this many settled nodes. A stopped search only adds an unnecessary
+# shortcut, so the limit trades preprocessing time against a slightly larger hierarchy.
+WITNESS_SETTLE_LIMIT = 50
+
+# (neighbour, time in seconds, distance in meters)
+Edge = Tuple[int, float, float]
+
+
+def witness_search(
+    out_edges: List[Dict[int, Tuple[float, float]]],
+    source: int,
+    skipped: int,
+    max_time: float,
+    targets: set
+) -> Dict[int, float]:
+    """
+    Dijkstra from source that ignores the node being contracted. It stops beyond max_time
+    or as soon as all targets are settled.
+    """
+    times = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    remaining_targets = set(targets)
+
+    while heap and settled < WITNESS_SETTLE_LIMIT:
+        time, node = heapq.heappop(heap)
+        if time > max_time:
+            break
+        if time > times.get(node, float("inf")):
+            continue
+        settled += 1
+        remaining_targets.discard(node)
+        if not remaining_targets:
+            break
+        for neighbour, (edge_time, _) in out_edges[node].items():
+            if neighbour == skipped:
+                continue
+            candidate = time + edge_time
+            if candidate < times.get(neighbour, float("inf")):
+                times[neighbour] = candidate
+                heapq.heappush(heap, (candidate, neighbour))
+
+    return times
+
+
+def find_shortcuts(
+    out_edges: List[Dict[int, Tuple[float, float]]],
+    in_edges: List[Dict[int, Tuple[float, float]]],
+    node: int
+) -> List[Tuple[int, int, float, float]]:
+    """
+    Returns the shortcuts (from, to, time, distance) needed to keep all shortest paths through node
+    when node is removed from the remaining graph.
+    """
+    shortcuts = []
+    if not out_edges[node]:
+        return shortcuts
+    max_out_time = max(time for time, _ in out_edges[node].values())
+    targets = set(out_edges[node])
+
+    for source, (in_time, in_distance) in in_edges[node].items():
+        witness_times = witness_search(out_edges, source, node, in_time + max_out_time, targets - {source})
+        for target, (out_time, out_distance) in out_edges[node].items():
+            if target == source:
+                continue
+            via_time = in_time + out_time
+            if witness_times.get(target, float("inf")) > via_time:
+                shortcuts.append((source, target, via_time, in_distance + out_distance))
+
+    return shortcuts
+
+
+def to_csr(adjacency: List[List[Edge]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    offsets = np.zeros(len(adjacency) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(edges) for edges in adjacency])
+    flat = [edge for edges in adjacency for edge in edges]
+    targets = np.array([edge[0] for edge in flat], dtype=np.int32)
+    times = np.array([edge[1] for edge in flat], dtype=np.float32)
+    distances = np.array([edge[2] for edge in flat], dtype=np.float32)
+    return offsets, targets, times, distances
+
+
+def contract_graph(
+    node_count: int,
+    sources: Sequence[int],
+    targets: Sequence[int],
+    times: Sequence[float],
+    distances: Sequence[float]
+) -> Dict[str, np.ndarray]:
+    """
+    Builds a contraction hierarchy on travel time. Nodes are contracted in order of edge difference plus
+    contracted neighbours, and every edge is kept at its lower-ranked end:
+    - forward graph: node -> higher ranked node, searched from the sources of a query
+    - backward graph: node <- higher ranked node, searched from the targets of a query
+    Shortcuts also carry the summed distance, so distances follow the fastest path.
+    """
+    out_edges: List[Dict[int, Tuple[float, float]]] = [dict() for _ in range(node_count)]
+    in_edges: List[Dict[int, Tuple[float, float]]] = [dict() for _ in range(node_count)]
+
+    for source, target, time, distance in zip(sources, targets, times, distances):
+        if source == target:
+            continue
+        if target not in out_edges[source] or time < out_edges[source][target][0]:
+            out_edges[source][target] = (float(time), float(distance))
+            in_edges[target][source] = (float(time), float(distance))
+
+    contracted_neighbours = [0] * node_count
+
+    def priority(node: int) -> int:
+        shortcut_count = len(find_shortcuts(out_edges, in_edges, node))
+        return shortcut_count - len(out_edges[node]) - len(in_edges[node]) + contracted_neighbours[node]
+
+    heap = [(priority(node), node) for node in range(node_count)]
+    heapq.heapify(heap)
+
+    forward_up: List[List[Edge]] = [[] for _ in range(node_count)]
+    backward_up: List[List[Edge]] = [[] for _ in range(node_count)]
+    is_contracted = bytearray(node_count)
+
+    while heap:
+        _, node = heapq.heappop(heap)
+        if is_contracted[node]:
+            continue
+
+        # Lazy update: the stored priority may be outdated by earlier contractions
+        current_priority = priority(node)
+        if heap and current_priority > heap[0][0]:
+            heapq.heappush(heap, (current_priority, node))
+            continue
+
+        shortcuts = find_shortcuts(out_edges, in_edges, node)
+        is_contracted[node] = 1
+
+        for target, (time, distance) in out_edges[node].items():
+            forward_up[node].append((target, time, distance))
+            del in_edges[target][node]
+            contracted_neighbours[target] += 1
+        for source, (time, distance) in in_edges[node].items():
+            backward_up[node].append((source, time, distance))
+            del out_edges[source][node]
+            contracted_neighbours[source] += 1
+        out_edges[node].clear()
+        in_edges[node].clear()
+
+        for source, target, time, distance in shortcuts:
+            if target not in out_edges[source] or time < out_edges[source][target][0]:
+                out_edges[source][target] = (time, distance)
+                in_edges[target][source] = (time, distance)
+
+    forward = to_csr(forward_up)
+    backward = to_csr(backward_up)
+    return {
+        "forward_offsets": forward[0],
+        "forward_targets": forward[1],
+        "forward_times": forward[2],
+        "forward_distances": forward[3],
+        "backward_offsets": backward[0],
+        "backward_targets": backward[1],
+        "backward_times": backward[2],
+        "backward_distances": backward[3],
+    }
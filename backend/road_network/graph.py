@@ -0,0 +1,224 @@
+import heapq
+import json
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from road_network.contraction import contract_graph
+from solver.models import Location
+
+GRAPH_ARRAYS = (
+    "coordinates",
+    "grid_cells",
+    "grid_nodes",
+    "forward_offsets",
+    "forward_targets",
+    "forward_times",
+    "forward_distances",
+    "backward_offsets",
+    "backward_targets",
+    "backward_times",
+    "backward_distances",
+)
+GRID_CELL_DEGREES = 0.005  # about 550 m in latitude
+GRID_COLUMNS = int(360 / GRID_CELL_DEGREES) + 1
+EARTH_RADIUS_METERS = 6371000.0
+# The way from a location to the snapped road node is assumed to be walked/driven slowly
+ACCESS_SPEED_METERS_PER_SECOND = 15 / 3.6
+
+
+def haversine_meters(lat, lng, other_lat, other_lng):
+    lat, lng, other_lat, other_lng = map(np.radians, (lat, lng, other_lat, other_lng))
+    a = np.sin((other_lat - lat) / 2) ** 2 + np.cos(lat) * np.cos(other_lat) * np.sin((other_lng - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
+
+
+def grid_cell(lat, lng):
+    row = np.floor((np.asarray(lat) + 90) / GRID_CELL_DEGREES).astype(np.int64)
+    column = np.floor((np.asarray(lng) + 180) / GRID_CELL_DEGREES).astype(np.int64)
+    return row * GRID_COLUMNS + column
+
+
+def build_road_graph(
+    directory: str,
+    coordinates: np.ndarray,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    times: np.ndarray,
+    distances: np.ndarray
+):
+    """
+    Preprocesses a directed road graph (node coordinates as (lat, lng), edges with time in seconds and
+    distance in meters) and writes it as one .npy file per array, so it can be memory-mapped.
+    """
+    os.makedirs(directory, exist_ok=True)
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+
+    arrays = contract_graph(len(coordinates), sources.tolist(), targets.tolist(), times.tolist(), distances.tolist())
+
+    cells = grid_cell(coordinates[:, 0], coordinates[:, 1])
+    order = np.argsort(cells, kind="stable")
+    arrays["grid_cells"] = cells[order]
+    arrays["grid_nodes"] = order.astype(np.int32)
+    arrays["coordinates"] = coordinates
+
+    for name in GRAPH_ARRAYS:
+        np.save(os.path.join(directory, f"{name}.npy"), arrays[name])
+    with open(os.path.join(directory, "graph.json"), "w") as file:
+        json.dump({"nodes": len(coordinates), "grid_cell_degrees": GRID_CELL_DEGREES}, file)
+
+
+class RoadGraph:
+    """
+    Contraction hierarchy of a road network, memory-mapped from the directory written by build_road_graph.
+    The pages are shared between all worker processes that open the same graph.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "graph.json")) as file:
+            metadata = json.load(file)
+        if metadata["grid_cell_degrees"] != GRID_CELL_DEGREES:
+            raise ValueError(f"Road graph in {directory} was built with another grid, rebuild it")
+
+        self.arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in GRAPH_ARRAYS
+        }
+        self.coordinates = self.arrays["coordinates"]
+
+    def snap(self, lat: float, lng: float) -> Tuple[int, float]:
+        """
+        Returns the nearest road node and its distance in meters. Rings of grid cells are searched
+        until a node is found, plus one more ring, since a node in the next ring can still be closer.
+        """
+        grid_cells, grid_nodes = self.arrays["grid_cells"], self.arrays["grid_nodes"]
+        center = int(grid_cell(lat, lng))
+        found_in_ring = None
+        candidates: List[np.ndarray] = []
+
+        for ring in range(GRID_COLUMNS):
+            for row_offset in range(-ring, ring + 1):
+                for column_offset in range(-ring, ring + 1):
+                    if max(abs(row_offset), abs(column_offset)) != ring:
+                        continue
+                    cell = center + row_offset * GRID_COLUMNS + column_offset
+                    start, end = np.searchsorted(grid_cells, [cell, cell + 1])
+                    if end > start:
+                        candidates.append(np.asarray(grid_nodes[start:end]))
+            if candidates and found_in_ring is None:
+                found_in_ring = ring
+            if found_in_ring is not None and ring > found_in_ring:
+                break
+            if ring > 100:
+                raise ValueError(f"No road found near {lat},{lng}")
+
+        nodes = np.concatenate(candidates)
+        node_coordinates = np.asarray(self.coordinates[nodes])
+        distances = haversine_meters(lat, lng, node_coordinates[:, 0], node_coordinates[:, 1])
+        best = int(np.argmin(distances))
+        return int(nodes[best]), float(distances[best])
+
+    def upward_search(self, direction: str, start: int) -> Dict[int, Tuple[float, float]]:
+        """
+        Dijkstra restricted to edges towards higher ranked nodes. Returns time and distance of every
+        node in the (small) upward search space.
+        """
+        offsets = self.arrays[f"{direction}_offsets"]
+        targets = self.arrays[f"{direction}_targets"]
+        times = self.arrays[f"{direction}_times"]
+        distances = self.arrays[f"{direction}_distances"]
+
+        settled: Dict[int, Tuple[float, float]] = {}
+        heap = [(0.0, start, 0.0)]
+        while heap:
+            time, node, distance = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled[node] = (time, distance)
+
+            begin, end = int(offsets[node]), int(offsets[node + 1])
+            for neighbour, edge_time, edge_distance in zip(
+                targets[begin:end].tolist(), times[begin:end].tolist(), distances[begin:end].tolist()
+            ):
+                if neighbour not in settled:
+                    heapq.heappush(heap, (time + edge_time, neighbour, distance + edge_distance))
+
+        return settled
+
+    def many_to_many(self, sources: List[int], targets: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Bucket-based many-to-many query: the backward search of every target leaves (target, time, distance)
+        entries in the buckets of the nodes it settles, the forward search of every source then scans the
+        buckets of its settled nodes. Returns time (seconds) and distance (meters), inf if unreachable.
+        """
+        buckets: Dict[int, List[Tuple[int, float, float]]] = {}
+        for target_index, target in enumerate(targets):
+            for node, (time, distance) in self.upward_search("backward", target).items():
+                buckets.setdefault(node, []).append((target_index, time, distance))
+
+        bucket_arrays = {
+            node: (
+                np.array([entry[0] for entry in entries], dtype=np.int64),
+                np.array([entry[1] for entry in entries]),
+                np.array([entry[2] for entry in entries]),
+            )
+            for node, entries in buckets.items()
+        }
+
+        best_times = np.full((len(sources), len(targets)), np.inf)
+        best_distances = np.full((len(sources), len(targets)), np.inf)
+        for source_index, source in enumerate(sources):
+            row_times, row_distances = best_times[source_index], best_distances[source_index]
+            for node, (time, distance) in self.upward_search("forward", source).items():
+                if node not in bucket_arrays:
+                    continue
+                target_indices, bucket_times, bucket_distances = bucket_arrays[node]
+                via_times = time + bucket_times
+                improved = via_times < row_times[target_indices]
+                row_times[target_indices[improved]] = via_times[improved]
+                row_distances[target_indices[improved]] = distance + bucket_distances[improved]
+
+        return best_times, best_distances
+
+    def snap_all(self, locations: List[Location]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Snaps the locations and returns the distinct road nodes, the position of every location
+        in them and the access distance of every location in meters.
+        """
+        snapped = [self.snap(location.lat, location.lng) for location in locations]
+        unique_nodes, node_positions = np.unique([node for node, _ in snapped], return_inverse=True)
+        return unique_nodes, node_positions.reshape(-1), np.array([meters for _, meters in snapped])
+
+    def distance_and_duration_seconds(
+        self,
+        origins: List[Location],
+        destinations: List[Location]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Same contract as the Google provider: distances in meters, durations in seconds, -1 if unreachable.
+        """
+        # Many locations share a road node, each node is only searched once
+        origin_nodes, origin_positions, origin_access = self.snap_all(origins)
+        destination_nodes, destination_positions, destination_access = self.snap_all(destinations)
+
+        times, distances = self.many_to_many(origin_nodes.tolist(), destination_nodes.tolist())
+        times = times[np.ix_(origin_positions, destination_positions)]
+        distances = distances[np.ix_(origin_positions, destination_positions)]
+
+        access = origin_access[:, None] + destination_access[None, :]
+        times = times + access / ACCESS_SPEED_METERS_PER_SECOND
+        distances = distances + access
+
+        same_place = (
+            np.array([[loc.lat, loc.lng] for loc in origins])[:, None, :]
+            == np.array([[loc.lat, loc.lng] for loc in destinations])[None, :, :]
+        ).all(axis=2)
+        times[same_place] = 0
+        distances[same_place] = 0
+
+        unreachable = ~np.isfinite(times)
+        distances[unreachable] = -1
+        times[unreachable] = -1
+        distance_matrix = np.round(distances).astype(np.int32)
+        duration_matrix = np.round(times).astype(np.int32)
+        return distance_matrix, duration_matrix
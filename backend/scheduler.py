@@ -0,0 +1,249 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from capture.recorder import solve_and_capture
+from solver.models import EnhancedOptimizationRequest, Solution
+
+# Lower value = served first
+PRIORITY_CLASSES = {"interactive": 0, "normal": 1, "batch": 2}
+# Used if the client sends no X-Latency-Target-Ms
+DEFAULT_LATENCY_TARGETS_MS = {0: 3000, 1: 30000, 2: 600000}
+
+# Server processes on this host (set by serve.py), every process has its own scheduler
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+def per_process_limit(host_limit: int) -> int:
+    # The limits are configured for the whole host and split evenly across the server processes
+    return max(1, host_limit // WEB_CONCURRENCY)
+
+
+HOST_SOLVER_CONCURRENCY = int(os.getenv("SOLVER_CONCURRENCY", str(os.cpu_count() or 1)))
+SOLVER_CONCURRENCY = per_process_limit(HOST_SOLVER_CONCURRENCY)
+TENANT_MAX_CONCURRENT = per_process_limit(
+    int(os.getenv("TENANT_MAX_CONCURRENT", str(max(1, HOST_SOLVER_CONCURRENCY // 2))))
+)
+TENANT_MAX_QUEUED = per_process_limit(int(os.getenv("TENANT_MAX_QUEUED", "20")))
+
+MAX_TIME_LIMIT_SECONDS = 15
+# Share of the remaining time given to the search, the rest covers model construction and the response
+SEARCH_TIME_SHARE = 0.8
+# Below this remaining time the OR-Tools search is not worth starting, the quick heuristic answers instead
+QUICK_SOLVE_BELOW_SECONDS = 1.0
+
+
+class TenantQuotaExceeded(Exception):
+    pass
+
+
+@dataclass(order=True)
+class SolveTicket:
+    # Ordered by priority class, then earliest deadline first, then arrival
+    priority: int
+    deadline: float
+    sequence: int
+    tenant: str = field(compare=False)
+    granted: threading.Event = field(default_factory=threading.Event, compare=False)
+    # Called when the slot is granted, wakes up an async waiter
+    on_grant: Optional[Callable[[], None]] = field(default=None, compare=False)
+
+
+class ArrivalTimeMiddleware:
+    """
+    Stores the arrival time of every request (time.monotonic()) as request.state.arrived_at,
+    so deadlines also count the time spent on parsing, geocoding and matrices before the solve.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["arrived_at"] = time.monotonic()
+        await self.app(scope, receive, send)
+
+
+def solve_options_from_headers(headers: Mapping[str, str]) -> Tuple[str, int, int]:
+    """
+    Reads X-Tenant-Id, X-Priority (interactive, normal, batch or 0-2) and X-Latency-Target-Ms.
+    Raises ValueError for invalid values.
+    """
+    tenant = headers.get("x-tenant-id") or "default"
+
+    priority_header = (headers.get("x-priority") or "normal").strip().lower()
+    if priority_header in PRIORITY_CLASSES:
+        priority = PRIORITY_CLASSES[priority_header]
+    elif priority_header.isdigit() and int(priority_header) in PRIORITY_CLASSES.values():
+        priority = int(priority_header)
+    else:
+        raise ValueError(f"X-Priority must be one of {', '.join(PRIORITY_CLASSES)}")
+
+    latency_header = headers.get("x-latency-target-ms")
+    if latency_header is None:
+        latency_target_ms = DEFAULT_LATENCY_TARGETS_MS[priority]
+    elif latency_header.isdigit() and int(latency_header) > 0:
+        latency_target_ms = int(latency_header)
+    else:
+        raise ValueError("X-Latency-Target-Ms must be a positive integer")
+
+    return tenant, priority, latency_target_ms
+
+
+class SolveScheduler:
+    """
+    Admits at most `concurrency` solves at a time. Waiting solves are started by priority class and earliest
+    deadline, skipping tenants that already run `tenant_max_concurrent` solves, so one tenant's large
+    batch cannot block the small interactive requests of others.
+    API requests wait for their slot on the event loop (run_async) and only take a thread once they solve.
+    """
+
+    def __init__(self, concurrency: int, tenant_max_concurrent: int, tenant_max_queued: int):
+        self.concurrency = concurrency
+        self.tenant_max_concurrent = tenant_max_concurrent
+        self.tenant_max_queued = tenant_max_queued
+
+        self.lock = threading.Lock()
+        self.waiting: List[SolveTicket] = []
+        self.running = 0
+        self.running_by_tenant: Dict[str, int] = {}
+        self.waiting_by_tenant: Dict[str, int] = {}
+        self.sequence = itertools.count()
+
+    def submit(
+        self,
+        tenant: str,
+        priority: int,
+        latency_target_ms: int,
+        arrived_at: Optional[float] = None
+    ) -> SolveTicket:
+        """
+        Queues a solve. The deadline counts from arrived_at (time.monotonic() at request arrival), default now.
+        """
+        if arrived_at is None:
+            arrived_at = time.monotonic()
+        with self.lock:
+            if self.waiting_by_tenant.get(tenant, 0) >= self.tenant_max_queued:
+                raise TenantQuotaExceeded(f"Tenant {tenant} already has {self.tenant_max_queued} queued solves")
+
+            ticket = SolveTicket(priority, arrived_at + latency_target_ms / 1000, next(self.sequence), tenant)
+            heapq.heappush(self.waiting, ticket)
+            self.waiting_by_tenant[tenant] = self.waiting_by_tenant.get(tenant, 0) + 1
+            self.dispatch()
+            return ticket
+
+    def dispatch(self):
+        # Called with the lock held: grants free slots to the first waiting tickets within their tenant quota
+        skipped = []
+        while self.waiting and self.running < self.concurrency:
+            ticket = heapq.heappop(self.waiting)
+            if self.running_by_tenant.get(ticket.tenant, 0) >= self.tenant_max_concurrent:
+                skipped.append(ticket)
+                continue
+            self.running += 1
+            self.running_by_tenant[ticket.tenant] = self.running_by_tenant.get(ticket.tenant, 0) + 1
+            self.waiting_by_tenant[ticket.tenant] -= 1
+            ticket.granted.set()
+            if ticket.on_grant is not None:
+                ticket.on_grant()
+        for ticket in skipped:
+            heapq.heappush(self.waiting, ticket)
+
+    def wait(self, ticket: SolveTicket):
+        # Blocks the calling thread, for the job workers
+        ticket.granted.wait()
+
+    async def wait_async(self, ticket: SolveTicket):
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def on_grant():
+            # dispatch runs in whichever thread released a slot
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        with self.lock:
+            if ticket.granted.is_set():
+                return
+            ticket.on_grant = on_grant
+        try:
+            await granted
+        except asyncio.CancelledError:
+            # The client went away: give up the place in the queue, or the slot if it was granted meanwhile
+            self.withdraw(ticket)
+            raise
+
+    def withdraw(self, ticket: SolveTicket):
+        with self.lock:
+            if ticket.granted.is_set():
+                self.release_locked(ticket)
+                return
+            self.waiting.remove(ticket)
+            heapq.heapify(self.waiting)
+            self.waiting_by_tenant[ticket.tenant] -= 1
+
+    def release(self, ticket: SolveTicket):
+        with self.lock:
+            self.release_locked(ticket)
+
+    def release_locked(self, ticket: SolveTicket):
+        self.running -= 1
+        self.running_by_tenant[ticket.tenant] -= 1
+        self.dispatch()
+
+    def solve(self, ticket: SolveTicket, request: EnhancedOptimizationRequest, **solver_options: Any) -> Solution:
+        """
+        Solves in a granted slot with a time limit that fits the remaining time until the deadline,
+        then releases the slot.
+        """
+        try:
+            remaining_seconds = ticket.deadline - time.monotonic()
+            if remaining_seconds < QUICK_SOLVE_BELOW_SECONDS:
+                return solve_and_capture("quick", request)
+            time_limit = min(MAX_TIME_LIMIT_SECONDS, remaining_seconds * SEARCH_TIME_SHARE)
+            return solve_and_capture("pca", request, optimization_time_limit=time_limit, **solver_options)
+        finally:
+            self.release(ticket)
+
+    def run(
+        self,
+        request: EnhancedOptimizationRequest,
+        tenant: str,
+        priority: int,
+        latency_target_ms: int,
+        arrived_at: Optional[float] = None,
+        **solver_options: Any
+    ) -> Solution:
+        """
+        Waits for a slot in the calling thread and solves.
+        """
+        ticket = self.submit(tenant, priority, latency_target_ms, arrived_at)
+        self.wait(ticket)
+        return self.solve(ticket, request, **solver_options)
+
+    async def run_async(
+        self,
+        request: EnhancedOptimizationRequest,
+        tenant: str,
+        priority: int,
+        latency_target_ms: int,
+        arrived_at: Optional[float] = None,
+        **solver_options: Any
+    ) -> Solution:
+        """
+        Waits for a slot on the event loop, so queued solves hold no threadpool thread, and solves in a thread.
+        """
+        ticket = self.submit(tenant, priority, latency_target_ms, arrived_at)
+        await self.wait_async(ticket)
+        return await run_in_threadpool(self.solve, ticket, request, **solver_options)
+
+
+solve_scheduler = SolveScheduler(SOLVER_CONCURRENCY, TENANT_MAX_CONCURRENT, TENANT_MAX_QUEUED)
+
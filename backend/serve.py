@@ -0,0 +1,82 @@
+# backend/serve.py
+import contextlib
+import io
+import os
+import time
+
+from dotenv import load_dotenv
+from gunicorn.app.base import BaseApplication
+
+load_dotenv()
+
+WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+BIND = os.getenv("BIND", "0.0.0.0:8080")
+# The scheduler splits the host-wide solver concurrency and tenant quotas across the workers
+os.environ["WEB_CONCURRENCY"] = str(WORKERS)
+
+
+def warm_up():
+    """
+    Loads OR-Tools, NumPy and requests (which the app imports on first use) and runs both solvers once on
+    a tiny request, so the first real request of every worker does not pay for imports and first-call
+    initialisation. Runs in the master before the workers are forked.
+    Must not open connections or start threads, forked workers would share them.
+    """
+    import geocoding.google  # noqa: F401
+    from solver.models import EnhancedOptimizationRequest
+    from solver.quick import solve_appointment_routing_quick
+    from solver.solver import solve_appointment_routing_pca
+
+    address = {"street": "Warm-up", "zip_code": "00000", "city": "Warm-up"}
+    request = EnhancedOptimizationRequest(
+        company_info={
+            "start_address": address,
+            "finish_address": address,
+            "number_of_workers": [{"vehicle_id": 0, "skills": None, "worker_amount": 1}],
+        },
+        appointments=[{
+            "appointment_start": "2025-01-01 09:00:00.000",
+            "appointment_end": "2025-01-01 09:30:00.000",
+            "address": address,
+            "location": {"id": "warm-up", "lat": 0.0, "lng": 0.0},
+            "number_of_workers": 1,
+        }],
+        time_matrix=[[0, 10], [10, 0]],
+        distance_matrix=[[0, 1000], [1000, 0]],
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        solve_appointment_routing_quick(request)
+        solve_appointment_routing_pca(request, optimization_time_limit=0.1)
+
+
+class PreforkServer(BaseApplication):
+    """
+    Gunicorn with the app loaded and warmed up once in the master (preload_app), then forked into the workers.
+    The workers share the loaded modules copy-on-write and are ready as soon as they are forked.
+    """
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        started = time.perf_counter()
+        from app import app
+
+        warm_up()
+        print(f"App loaded and warmed up in {time.perf_counter() - started:.2f}s, forking {WORKERS} workers")
+        return app
+
+
+if __name__ == "__main__":
+    PreforkServer({
+        "bind": BIND,
+        "workers": WORKERS,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "timeout": 120,
+    }).run()
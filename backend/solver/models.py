@@ -1,7 +1,48 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from pydantic import BaseModel, Field, BeforeValidator, PlainSerializer, WithJsonSchema
+from typing import TYPE_CHECKING, Annotated, Any, List, Dict, Optional
 from dataclasses import dataclass
 
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def to_int_array(value: Any) -> "np.ndarray":
+    # NumPy is imported on first use, importing the models (and the app) does not load it
+    import numpy as np
+
+    array = np.asarray(value)
+    if array.size == 0:
+        return array.astype(np.int16)
+    if array.dtype.kind not in "iu":
+        raise ValueError(f"Expected a rectangular array of integers, got dtype {array.dtype}")
+    # Store with the smallest of int16/int32 that holds all values
+    for dtype in (np.int16, np.int32):
+        limits = np.iinfo(dtype)
+        if array.min() >= limits.min and array.max() <= limits.max:
+            return array.astype(dtype, copy=False)
+    return array
+
+
+def int_array_to_list(array: Any) -> list:
+    return array.tolist() if hasattr(array, "tolist") else list(array)
+
+
+# Integer array that is kept as a NumPy array in memory instead of nested Python lists
+IntArray = Annotated[
+    Any,
+    BeforeValidator(to_int_array),
+    PlainSerializer(int_array_to_list, return_type=list),
+    WithJsonSchema({"type": "array", "items": {"type": "array", "items": {"type": "array", "items": {"type": "integer"}}}}),
+]
+
+# Same as IntArray, documented as a single matrix
+IntMatrix = Annotated[
+    Any,
+    BeforeValidator(to_int_array),
+    PlainSerializer(int_array_to_list, return_type=list),
+    WithJsonSchema({"type": "array", "items": {"type": "array", "items": {"type": "integer"}}}),
+]
+
 # Define data models
 class Node(BaseModel):
     id: str
@@ -39,6 +80,7 @@ class Appointment(BaseModel):
     appointment_end: str
     address:Address
     number_of_workers: int
+    required_skills: Optional[List[str]] = None
 
 class EnhancedAppointment(BaseModel):
     appointment_start: str
@@ -46,10 +88,11 @@ class EnhancedAppointment(BaseModel):
     address:Address
     location:Location
     number_of_workers: int
+    required_skills: Optional[List[str]] = None
 
 class FilledVehicle(BaseModel):
     vehicle_id:int
-    skills:Optional[str]
+    skills:Optional[str]  # comma separated, e.g. "electrician, plumber"
     worker_amount:int
 
 class CompanyInfo(BaseModel):
@@ -65,16 +108,13 @@ class OptimizationRequest(BaseModel):
 class DistanceMatrixRequest(BaseModel):
     locations: List[Location]
 
-class MatrixElement(BaseModel):
-    from_id: str
-    to_id: str
-    distance_text: str
-    distance_value: int
-    duration_text: str
-    duration_value: int
-
 class DistanceMatrixResponse(BaseModel):
-    matrix: List[MatrixElement]
+    # Columnar matrix: the ids are listed once, the values are row-major little-endian int32 arrays
+    # (ids[i] -> ids[j] at index i * len(ids) + j), encoded as base64
+    ids: List[str]
+    distance_values: str  # meters
+    duration_values: str  # seconds
+    failed_cells: List[List[int]] = Field(default_factory=list)  # [row, column] of cells without a route
 
 @dataclass
 class EnhancedAddressResponse:
@@ -94,8 +134,12 @@ class AppointmentValidationResponse(BaseModel):
 class EnhancedOptimizationRequest(BaseModel):
     company_info: CompanyInfo
     appointments: List[EnhancedAppointment]
-    time_matrix: List[List[int]]
-    distance_matrix: List[List[int]]
+    time_matrix: IntMatrix
+    distance_matrix: IntMatrix
+    # Optional travel times by departure time: time_matrices[b] applies to departures from
+    # time_matrix_buckets[b] (minutes since midnight) until the next bucket starts
+    time_matrix_buckets: Optional[List[int]] = None
+    time_matrices: Optional[IntArray] = None
 
 class DistanceAndDurationMatrices(BaseModel):
     ids: List[str]  # Liste der IDs
@@ -121,3 +165,9 @@ class Solution(BaseModel):
 
 
 
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str  # queued, running, done or failed
+    solution: Optional[Solution] = None
+    error: Optional[str] = None
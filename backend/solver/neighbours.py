@@ -0,0 +1,69 @@
+# backend/solver/neighbours.py
+import os
+from typing import Callable, List
+
+import numpy as np
+
+from solver.models import EnhancedAppointment
+
+# Number of candidate successors per appointment, 0 disables the restriction
+CANDIDATE_NEIGHBOURS = int(os.getenv("CANDIDATE_NEIGHBOURS", "20"))
+# Small instances are solved well without the restriction, it only pays off for large ones
+CANDIDATE_MIN_APPOINTMENTS = int(os.getenv("CANDIDATE_MIN_APPOINTMENTS", "200"))
+# Rows of the distance and feasibility blocks computed at once, bounds the memory to CHUNK_ROWS x n values
+CHUNK_ROWS = 512
+
+
+def to_unit_vectors(appointments: List[EnhancedAppointment]) -> np.ndarray:
+    # Points on the unit sphere: the straight-line distance orders like the great-circle distance
+    lat = np.radians([appt.location.lat for appt in appointments])
+    lng = np.radians([appt.location.lng for appt in appointments])
+    return np.stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)], axis=1)
+
+
+def nearest_feasible_successors(
+    appointments: List[EnhancedAppointment],
+    feasible_rows: Callable[[int, int], np.ndarray],
+    k: int
+) -> List[np.ndarray]:
+    """
+    Returns for every appointment the indices of the k geographically nearest appointments that can follow it.
+    feasible_rows(begin, end)[i, j] is True if appointment j can be served after appointment begin + i.
+    Computed block by block, so thousands of appointments need neither a full distance or feasibility matrix
+    in memory nor a sort of whole rows.
+    """
+    points = to_unit_vectors(appointments)
+    count = len(points)
+    k = min(k, count - 1)
+    successors: List[np.ndarray] = []
+    if k <= 0:
+        return [np.empty(0, dtype=np.int64) for _ in range(count)]
+
+    for begin in range(0, count, CHUNK_ROWS):
+        block = points[begin:begin + CHUNK_ROWS]
+        squared_distances = np.maximum(2.0 - 2.0 * block @ points.T, 0.0)
+        rows = np.arange(len(block))
+        squared_distances[rows, begin + rows] = np.inf
+        squared_distances[~feasible_rows(begin, begin + len(block))] = np.inf
+
+        nearest = np.argpartition(squared_distances, k - 1, axis=1)[:, :k]
+        for row, candidates in enumerate(nearest):
+            successors.append(candidates[np.isfinite(squared_distances[row, candidates])])
+
+    return successors
+
+
+def add_route_neighbours(successors: List[np.ndarray], routes: List[List[int]]) -> List[np.ndarray]:
+    """
+    Adds the predecessor and successor of every appointment on the given routes (nodes, appointment i is node i + 1)
+    to its candidate successors, so a search started from these routes is not cut off by the restriction.
+    """
+    extra: List[List[int]] = [[] for _ in successors]
+    for route in routes:
+        for previous, following in zip(route, route[1:]):
+            extra[previous - 1].append(following - 1)
+            extra[following - 1].append(previous - 1)
+    return [
+        np.union1d(candidates, np.asarray(added, dtype=np.int64)) if added else candidates
+        for candidates, added in zip(successors, extra)
+    ]
@@ -1,9 +1,10 @@
 from copy import deepcopy
 
 from solver.models import *
+from solver.util import matrix_to_lists, to_minutes
 from typing import List
 from datetime import datetime, timedelta
-from typing import Tuple
+from typing import Optional, Tuple
 import numpy as np
 
 def calculate_max_parallel_worker_demand(appointments: List[EnhancedAppointment]) -> int:
@@ -86,9 +87,10 @@ def calculate_travel_time_quantile(time_matrix: List[List[int]], quantile: float
         raise ValueError("Quantile must be between 0 and 1")
 
     # Flatten the 2D time matrix and exclude 0 (distance to self)
-    all_times = [time for row in time_matrix for time in row if time > 0]
+    matrix = np.asarray(time_matrix)
+    all_times = matrix[matrix > 0]
 
-    if not all_times:
+    if all_times.size == 0:
         return 0.0
 
     return float(np.quantile(all_times, quantile))
@@ -116,3 +118,106 @@ def calculate_max_overlap_with_shifted_end_times(
     return calculate_max_parallel_worker_demand(shifted_appointments)
 
 
+def build_time_dependent_time_matrix(
+    request: EnhancedOptimizationRequest,
+    time_windows: List[Tuple[int, int]],
+    service_times: List[int]
+) -> List[List[int]]:
+    """
+    Picks the travel time of every arc from the departure time bucket of its start node.
+
+    Transit callbacks cannot depend on the cumul of a node, but the departure times are known in advance:
+    an appointment has to start at its window start (the window is exactly as long as the service),
+    so the vehicle leaves at the window end. From the depot, vehicles leave so that they arrive at
+    the start of the first appointment, estimated with the static time matrix.
+    """
+    bucket_starts = np.asarray(request.time_matrix_buckets)
+    time_matrices = np.asarray(request.time_matrices)
+    static_time_matrix = np.asarray(request.time_matrix)
+    num_nodes = len(time_windows)
+
+    if time_matrices.shape != (len(bucket_starts), num_nodes, num_nodes):
+        raise ValueError(
+            f"time_matrices must have shape ({len(bucket_starts)}, {num_nodes}, {num_nodes}), "
+            f"got {time_matrices.shape}"
+        )
+
+    window_starts = np.array([start for start, _ in time_windows])
+    departures = np.repeat((window_starts + np.asarray(service_times))[:, None], num_nodes, axis=1)
+    departures[0, :] = window_starts - static_time_matrix[0, :]
+
+    order = np.argsort(bucket_starts)
+    buckets = np.searchsorted(bucket_starts[order], departures, side="right") - 1
+    buckets = order[np.clip(buckets, 0, len(bucket_starts) - 1)]
+
+    rows, columns = np.indices((num_nodes, num_nodes))
+    return time_matrices[buckets, rows, columns].tolist()
+
+
+def build_time_windows_and_service_times(
+    appointments: List[EnhancedAppointment]
+) -> Tuple[List[Tuple[int, int]], List[int]]:
+    """
+    Time windows and service times in minutes for the routing nodes, the depot is node 0.
+    """
+    time_windows = [(0, 1440)]  # Depot open all day
+    service_times = [0]  # Depot
+    for appt in appointments:
+        start = to_minutes(appt.appointment_start)
+        end = to_minutes(appt.appointment_end)
+        time_windows.append((start, end))
+        service_times.append(max(1, end - start))  # Minimum 1 minute
+
+    return time_windows, service_times
+
+
+def select_time_matrix(
+    request: EnhancedOptimizationRequest,
+    time_windows: List[Tuple[int, int]],
+    service_times: List[int]
+) -> List[List[int]]:
+    """
+    Travel times of the arcs: picked by departure time bucket if the request has time dependent matrices.
+    """
+    if request.time_matrices is not None and request.time_matrix_buckets:
+        return build_time_dependent_time_matrix(request, time_windows, service_times)
+    return matrix_to_lists(request.time_matrix)
+
+
+def parse_skills(skills: Optional[str]) -> set:
+    """
+    Vehicle skills arrive as one comma separated string.
+    """
+    return {skill.strip().casefold() for skill in (skills or "").split(",") if skill.strip()}
+
+
+def build_vehicle_eligibility(request: EnhancedOptimizationRequest) -> np.ndarray:
+    """
+    Boolean matrix (appointments x vehicles): a vehicle can serve an appointment if it has all required skills
+    and at least as many workers as the appointment needs.
+    """
+    vehicles = request.company_info.number_of_workers
+    vehicle_skills = [parse_skills(vehicle.skills) for vehicle in vehicles]
+    worker_amounts = np.array([vehicle.worker_amount for vehicle in vehicles])
+
+    eligibility = np.zeros((len(request.appointments), len(vehicles)), dtype=bool)
+    for row, appt in enumerate(request.appointments):
+        required_skills = {skill.strip().casefold() for skill in appt.required_skills or [] if skill.strip()}
+        has_skills = np.array([required_skills <= skills for skills in vehicle_skills], dtype=bool)
+        eligibility[row] = has_skills & (worker_amounts >= appt.number_of_workers)
+
+    return eligibility
+
+
+def describe_unservable_appointments(request: EnhancedOptimizationRequest, eligibility: np.ndarray) -> Optional[str]:
+    """
+    Lists the appointments no vehicle can serve, None if every appointment has an eligible vehicle.
+    """
+    unservable = np.flatnonzero(~eligibility.any(axis=1))
+    if unservable.size == 0:
+        return None
+    return ", ".join(
+        f"{request.appointments[row].address.street} {request.appointments[row].address.zip_code} "
+        f"{request.appointments[row].address.city} ({request.appointments[row].appointment_start})"
+        for row in unservable
+    )
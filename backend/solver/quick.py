@@ -0,0 +1,350 @@
+# backend/solver/quick.py
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from exceptionStrings import APPOINTMENT_NO_ELIGIBLE_VEHICLE, APPOINTMENT_OVERLAP_TO_BIG
+from solver.models import *
+from solver.preprocessing import *
+from solver.validate_routes import validate_routes
+
+QUICK_TIME_LIMIT_MS = 150
+QUICK_MAX_PASSES = 20
+
+
+class QuickRoutingModel:
+    """
+    Same model as the OR-Tools solver, solved with NumPy heuristics.
+
+    Every appointment starts exactly at its window start (the window is as long as the service), so a route
+    is ordered by start time and an arc i -> j is feasible if j starts after i ends plus the travel time,
+    with at most slack_max minutes of waiting. All constraints are arc-local, moves are checked on their new
+    arcs only. The OR-Tools cost (travel + service + waiting) of a route therefore only depends on its first
+    and last appointment: depot -> first, first start -> last end, last -> depot. Distance breaks ties.
+    """
+
+    def __init__(
+        self,
+        time_windows: List[Tuple[int, int]],
+        service_times: List[int],
+        time_matrix,
+        distance_matrix,
+        eligibility: np.ndarray,
+        slack_max: int,
+        max_time_per_vehicle: int
+    ):
+        self.starts = np.array([start for start, _ in time_windows], dtype=np.int64)
+        self.starts[0] = 0
+        self.ends = self.starts + np.asarray(service_times, dtype=np.int64)
+        self.latest_starts = np.array([end for _, end in time_windows], dtype=np.int64) - service_times
+        self.time_matrix = np.asarray(time_matrix, dtype=np.int64)
+        self.distance_matrix = np.asarray(distance_matrix, dtype=np.int64)
+        # eligibility[node, vehicle], the depot row allows every vehicle
+        self.eligibility = np.vstack([np.ones((1, eligibility.shape[1]), dtype=bool), eligibility])
+        self.num_vehicles = eligibility.shape[1]
+        # Number of appointments a vehicle can serve
+        self.versatility = eligibility.sum(axis=0)
+        self.slack_max = slack_max
+        self.max_time_per_vehicle = max_time_per_vehicle
+
+    def arc_feasible(self, from_nodes, to_nodes) -> np.ndarray:
+        """
+        Feasibility of the arcs from_nodes[k] -> to_nodes[k], node 0 is the depot (start or end of a route).
+        """
+        from_nodes, to_nodes = np.broadcast_arrays(from_nodes, to_nodes)
+        travel = self.time_matrix[from_nodes, to_nodes]
+        gap = self.starts[to_nodes] - self.ends[from_nodes] - travel
+
+        between_appointments = (gap >= 0) & (gap <= self.slack_max)
+        leave_depot = self.starts[to_nodes] - travel >= 0
+        return_to_depot = self.ends[from_nodes] + travel <= self.max_time_per_vehicle
+
+        return np.where(
+            from_nodes == 0,
+            np.where(to_nodes == 0, True, leave_depot),
+            np.where(to_nodes == 0, return_to_depot, between_appointments)
+        )
+
+    def route_cost(self, first, last) -> np.ndarray:
+        """
+        Time cost of routes given by their first and last appointment, -1 for an empty route.
+        """
+        first, last = np.broadcast_arrays(first, last)
+        safe_first, safe_last = np.maximum(first, 0), np.maximum(last, 0)
+        cost = (
+            self.time_matrix[0, safe_first] + self.ends[safe_last] - self.starts[safe_first]
+            + self.time_matrix[safe_last, 0]
+        )
+        return np.where(first > 0, cost, 0)
+
+    def construct(self) -> Optional[List[List[int]]]:
+        """
+        Inserts the appointments by start time at the end of the route where they add the least time,
+        evaluated for all vehicles at once. A new vehicle is only started if no route can be continued:
+        vehicles are the scarce resource, a route that waits longer than slack_max cannot be continued later.
+        Returns None if an appointment fits nowhere.
+        """
+        last_nodes = np.zeros(self.num_vehicles, dtype=np.int64)
+        routes: List[List[int]] = [[] for _ in range(self.num_vehicles)]
+
+        for node in np.argsort(self.starts[1:], kind="stable") + 1:
+            if self.starts[node] > self.latest_starts[node]:
+                return None
+
+            used = last_nodes > 0
+            feasible = self.arc_feasible(last_nodes, node) & self.arc_feasible(node, 0)
+            added_cost = self.route_cost(np.where(used, routes_first(routes), node), node) - self.route_cost(
+                np.where(used, routes_first(routes), -1), np.where(used, last_nodes, -1)
+            )
+
+            feasible &= self.eligibility[node]
+
+            candidates = feasible & used
+            if candidates.any():
+                vehicle = int(np.argmin(np.where(candidates, added_cost, np.iinfo(np.int64).max)))
+            else:
+                # Start the least versatile empty vehicle, the others stay free for appointments only they can serve
+                candidates = feasible & ~used
+                if not candidates.any():
+                    return None
+                vehicle = int(np.argmin(np.where(candidates, self.versatility, np.iinfo(np.int64).max)))
+            routes[vehicle].append(int(node))
+            last_nodes[vehicle] = node
+
+        return routes
+
+    def relocate(self, routes: List[List[int]]) -> bool:
+        """
+        Or-opt with single appointments: moves the first improving appointment to the best position
+        in another route. All insertion positions of all routes are evaluated as one array.
+        """
+        route_ids, from_nodes, to_nodes = arcs_of(routes)
+        firsts = np.array([route[0] if route else -1 for route in routes])
+        lasts = np.array([route[-1] if route else -1 for route in routes])
+        costs = self.route_cost(firsts, lasts)
+
+        for source, route in enumerate(routes):
+            for position, node in enumerate(route):
+                previous = route[position - 1] if position > 0 else 0
+                following = route[position + 1] if position + 1 < len(route) else 0
+                if not self.arc_feasible(previous, following):
+                    continue
+
+                remaining = route[:position] + route[position + 1:]
+                removal_time = self.route_cost(
+                    remaining[0] if remaining else -1, remaining[-1] if remaining else -1
+                ) - costs[source]
+                removal_distance = (
+                    self.distance_matrix[previous, following]
+                    - self.distance_matrix[previous, node] - self.distance_matrix[node, following]
+                )
+
+                targets = (
+                    (route_ids != source) & self.eligibility[node, route_ids]
+                    & self.arc_feasible(from_nodes, node) & self.arc_feasible(node, to_nodes)
+                )
+                target_firsts = np.where(from_nodes == 0, node, firsts[route_ids])
+                target_lasts = np.where(to_nodes == 0, node, lasts[route_ids])
+                insertion_time = self.route_cost(target_firsts, target_lasts) - costs[route_ids]
+                insertion_distance = (
+                    self.distance_matrix[from_nodes, node] + self.distance_matrix[node, to_nodes]
+                    - self.distance_matrix[from_nodes, to_nodes]
+                )
+
+                time_delta = removal_time + insertion_time
+                distance_delta = removal_distance + insertion_distance
+                improving = targets & ((time_delta < 0) | ((time_delta == 0) & (distance_delta < 0)))
+                if not improving.any():
+                    continue
+
+                best = np.lexsort((distance_delta, time_delta, ~improving))[0]
+                target = int(route_ids[best])
+                insert_at = routes[target].index(int(from_nodes[best])) + 1 if from_nodes[best] != 0 else 0
+                routes[source] = remaining
+                routes[target].insert(insert_at, node)
+                return True
+
+        return False
+
+    def exchange_tails(self, routes: List[List[int]]) -> bool:
+        """
+        2-opt* between two routes: A = a + a', B = b + b' becomes a + b', b + a'. The routes stay ordered by
+        time, so all cut positions of a pair of routes are evaluated as one array.
+        """
+        for first_route in range(len(routes)):
+            for second_route in range(first_route + 1, len(routes)):
+                a = np.array([0] + routes[first_route] + [0])
+                b = np.array([0] + routes[second_route] + [0])
+
+                # Cut after a[k] and b[m]
+                k = np.arange(len(a) - 1)[:, None]
+                m = np.arange(len(b) - 1)[None, :]
+                feasible = self.arc_feasible(a[k], b[m + 1]) & self.arc_feasible(b[m], a[k + 1])
+                # Swapping empty tails or whole routes changes nothing
+                feasible &= ~((k == len(a) - 2) & (m == len(b) - 2)) & ~((k == 0) & (m == 0))
+                # The tails change vehicles: tail_eligible[i] tells if all of a[i:] can be served by the other vehicle
+                a_tail_eligible = np.logical_and.accumulate(self.eligibility[a, second_route][::-1])[::-1]
+                b_tail_eligible = np.logical_and.accumulate(self.eligibility[b, first_route][::-1])[::-1]
+                feasible &= a_tail_eligible[k + 1] & b_tail_eligible[m + 1]
+
+                first_a = a[1] if len(a) > 2 else -1
+                first_b = b[1] if len(b) > 2 else -1
+                last_a = a[-2] if len(a) > 2 else -1
+                last_b = b[-2] if len(b) > 2 else -1
+                new_a = self.route_cost(
+                    np.where(k > 0, first_a, np.where(b[m + 1] > 0, b[m + 1], -1)),
+                    np.where(m < len(b) - 2, last_b, np.where(k > 0, a[k], -1))
+                )
+                new_b = self.route_cost(
+                    np.where(m > 0, first_b, np.where(a[k + 1] > 0, a[k + 1], -1)),
+                    np.where(k < len(a) - 2, last_a, np.where(m > 0, b[m], -1))
+                )
+                time_delta = new_a + new_b - self.route_cost(first_a, last_a) - self.route_cost(first_b, last_b)
+                distance_delta = (
+                    self.distance_matrix[a[k], b[m + 1]] + self.distance_matrix[b[m], a[k + 1]]
+                    - self.distance_matrix[a[k], a[k + 1]] - self.distance_matrix[b[m], b[m + 1]]
+                )
+
+                improving = feasible & ((time_delta < 0) | ((time_delta == 0) & (distance_delta < 0)))
+                if not improving.any():
+                    continue
+
+                order = np.lexsort((distance_delta.ravel(), time_delta.ravel(), ~improving.ravel()))
+                cut_a, cut_b = np.unravel_index(order[0], improving.shape)
+                routes[first_route], routes[second_route] = (
+                    routes[first_route][:cut_a] + routes[second_route][cut_b:],
+                    routes[second_route][:cut_b] + routes[first_route][cut_a:],
+                )
+                return True
+
+        return False
+
+    def solve(
+        self,
+        time_limit_ms: Optional[int] = QUICK_TIME_LIMIT_MS,
+        max_passes: int = QUICK_MAX_PASSES
+    ) -> Optional[List[List[int]]]:
+        """
+        Routes as lists of node indices per vehicle (without the depot), None if no feasible solution was found.
+        Without time_limit_ms only max_passes limits the search, so the same input always gives the same routes.
+        """
+        deadline = time.perf_counter() + time_limit_ms / 1000 if time_limit_ms is not None else None
+        routes = self.construct()
+        if routes is None:
+            return None
+
+        for _ in range(max_passes):
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            if not (self.relocate(routes) or self.exchange_tails(routes)):
+                break
+
+        return routes
+
+
+def routes_first(routes: List[List[int]]) -> np.ndarray:
+    return np.array([route[0] if route else 0 for route in routes], dtype=np.int64)
+
+
+def arcs_of(routes: List[List[int]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    All arcs of the routes including the depot legs: (route index, from node, to node).
+    """
+    route_ids, from_nodes, to_nodes = [], [], []
+    for route_id, route in enumerate(routes):
+        path = [0] + route + [0]
+        route_ids.extend([route_id] * (len(path) - 1))
+        from_nodes.extend(path[:-1])
+        to_nodes.extend(path[1:])
+    return np.array(route_ids), np.array(from_nodes), np.array(to_nodes)
+
+
+def build_quick_routes(
+    request: EnhancedOptimizationRequest,
+    slack_max: int = 120,
+    max_time_per_vehicle: int = 1440,
+    time_limit_ms: Optional[int] = QUICK_TIME_LIMIT_MS,
+    max_passes: int = QUICK_MAX_PASSES
+) -> Optional[List[List[int]]]:
+    time_windows, service_times = build_time_windows_and_service_times(request.appointments)
+    model = QuickRoutingModel(
+        time_windows,
+        service_times,
+        select_time_matrix(request, time_windows, service_times),
+        request.distance_matrix,
+        build_vehicle_eligibility(request),
+        slack_max,
+        max_time_per_vehicle
+    )
+    return model.solve(time_limit_ms, max_passes)
+
+
+def solve_appointment_routing_quick(
+    request: EnhancedOptimizationRequest,
+    slack_max: int = 120,
+    max_time_per_vehicle: int = 1440,
+    time_limit_ms: Optional[int] = QUICK_TIME_LIMIT_MS,
+    max_passes: int = QUICK_MAX_PASSES
+) -> Solution:
+    """
+    Sub-second alternative to solve_appointment_routing_pca for interactive edits: time-ordered insertion
+    followed by relocate and 2-opt* moves until no move improves, max_passes passes are done
+    or the time limit (None: no time limit) is reached.
+    """
+    if not validate_appointment_overlap(request, slack_max, max_time_per_vehicle):
+        print(APPOINTMENT_OVERLAP_TO_BIG)
+        return Solution(
+            total_distance_traveled=0,
+            max_distance_traveled=0,
+            routes=[],
+            method_used=APPOINTMENT_OVERLAP_TO_BIG
+        )
+
+    unservable_appointments = describe_unservable_appointments(request, build_vehicle_eligibility(request))
+    if unservable_appointments:
+        print(APPOINTMENT_NO_ELIGIBLE_VEHICLE)
+        return Solution(
+            total_distance_traveled=0,
+            max_distance_traveled=0,
+            routes=[],
+            method_used=f"{APPOINTMENT_NO_ELIGIBLE_VEHICLE}: {unservable_appointments}"
+        )
+
+    node_routes = build_quick_routes(request, slack_max, max_time_per_vehicle, time_limit_ms, max_passes)
+    if node_routes is None:
+        return Solution(
+            total_distance_traveled=0,
+            max_distance_traveled=0,
+            routes=[],
+            method_used="No solution found by the quick heuristic"
+        )
+
+    time_windows, service_times = build_time_windows_and_service_times(request.appointments)
+    time_matrix = np.asarray(select_time_matrix(request, time_windows, service_times))
+    distance_matrix = np.asarray(request.distance_matrix)
+
+    routes: List[Route] = []
+    for vehicle_id, node_route in enumerate(node_routes):
+        path = np.array([0] + node_route + [0])
+        route_distance = int(distance_matrix[path[:-1], path[1:]].sum())
+        # Travel plus service time, as reported by the OR-Tools solver
+        route_time = int(time_matrix[path[:-1], path[1:]].sum() + sum(service_times[node] for node in node_route))
+        routes.append(
+            Route(
+                route_id=vehicle_id,
+                vehicle_id=vehicle_id,
+                distance_traveled=route_distance,
+                time_traveled=route_time,
+                appointments=[request.appointments[node - 1] for node in node_route]
+            )
+        )
+
+    validate_routes(routes)
+
+    return Solution(
+        total_distance_traveled=sum(route.distance_traveled for route in routes),
+        max_distance_traveled=max((route.distance_traveled for route in routes), default=0),
+        routes=routes,
+        method_used="Quick Insertion"
+    )
@@ -1,11 +1,18 @@
 # backend/solver/solver.py
 import math
 import numpy as np
-from typing import Any
+from typing import Any, Optional
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
 
-from exceptionStrings import APPOINTMENT_OVERLAP_TO_BIG
+from exceptionStrings import APPOINTMENT_NO_ELIGIBLE_VEHICLE, APPOINTMENT_OVERLAP_TO_BIG, QUICK_START_REJECTED
 from solver.models import *
+from solver.neighbours import (
+    CANDIDATE_MIN_APPOINTMENTS,
+    CANDIDATE_NEIGHBOURS,
+    add_route_neighbours,
+    nearest_feasible_successors,
+)
+from solver.quick import QuickRoutingModel, build_quick_routes
 from solver.preprocessing import *
 from solver.util import *
 from solver.validate_routes import validate_routes
@@ -15,7 +22,11 @@ def solve_appointment_routing_pca(
     request: EnhancedOptimizationRequest,
     slack_max: int = 120,
     max_time_per_vehicle: int = 1440,
-    optimization_time_limit: int = 15
+    optimization_time_limit: float = 15,
+    use_quick_initial_solution: Optional[bool] = None,
+    candidate_neighbours: Optional[int] = None,
+    solution_limit: Optional[int] = None,
+    quick_max_passes: Optional[int] = None
 ) -> Solution:
 
     if not validate_appointment_overlap(request, slack_max, max_time_per_vehicle):
@@ -27,6 +38,17 @@ def solve_appointment_routing_pca(
             method_used= APPOINTMENT_OVERLAP_TO_BIG
         )
 
+    eligibility = build_vehicle_eligibility(request)
+    unservable_appointments = describe_unservable_appointments(request, eligibility)
+    if unservable_appointments:
+        print(APPOINTMENT_NO_ELIGIBLE_VEHICLE)
+        return Solution(
+            total_distance_traveled=0,
+            max_distance_traveled=0,
+            routes=[],
+            method_used=f"{APPOINTMENT_NO_ELIGIBLE_VEHICLE}: {unservable_appointments}"
+        )
+
     optimization_problem_information: List[str] = []
     total_appointment_time = sum_appointment_durations(request)
     optimization_problem_information.append(f"Total appointment time: "+ str(total_appointment_time))
@@ -53,8 +75,7 @@ def solve_appointment_routing_pca(
 
     company_info = request.company_info
     appointments = request.appointments
-    time_matrix = request.time_matrix
-    distance_matrix = request.distance_matrix
+    distance_matrix = matrix_to_lists(request.distance_matrix)
 
     depot_address = (
         f"{company_info.start_address.street} {company_info.start_address.zip_code} {company_info.start_address.city}"
@@ -64,17 +85,11 @@ def solve_appointment_routing_pca(
         f"{a.address.street} {a.address.zip_code} {a.address.city}" for a in appointments
     ]
 
-    # Time windows
-    time_windows = [(0, 1440)]  # Depot open all day
-    for appt in appointments:
-        time_windows.append((to_minutes(appt.appointment_start), to_minutes(appt.appointment_end)))
-
-    # Service times in minutes
-    service_times = [0]  # Depot
-    for appt in appointments:
-        start = to_minutes(appt.appointment_start)
-        end = to_minutes(appt.appointment_end)
-        service_times.append(max(1, end - start))  # Minimum 1 minute
+    time_windows, service_times = build_time_windows_and_service_times(appointments)
+    time_matrix = select_time_matrix(request, time_windows, service_times)
+    if request.time_matrices is not None and request.time_matrix_buckets:
+        optimization_problem_information.append(
+            f"Time dependent travel times with {len(request.time_matrix_buckets)} departure time buckets")
 
     num_locations = len(addresses)
     num_vehicles = len(company_info.number_of_workers)
@@ -121,15 +136,75 @@ def solve_appointment_routing_pca(
         cumul.SetRange(start, end)
         routing.solver().Add(cumul + service_times[idx] <= end)
 
+    # Appointments can only be assigned to vehicles with the required skills and workers
+    if not eligibility.all():
+        for node, allowed_vehicles in enumerate(eligibility, 1):
+            # Same as SetAllowedVehiclesForIndex, whose Python binding does not accept lists in every OR-Tools release
+            routing.VehicleVar(manager.NodeToIndex(node)).SetValues(np.flatnonzero(allowed_vehicles).tolist())
+
+    # Optionally start from the routes of the quick heuristic instead of the first solution strategy.
+    # By default only for heterogeneous fleets, where path cheapest arc often finds no first solution.
+    if use_quick_initial_solution is None:
+        use_quick_initial_solution = not eligibility.all()
+    # With quick_max_passes the start does not depend on the time limit of the quick heuristic (reproducible replays)
+    quick_routes = None
+    if use_quick_initial_solution:
+        if quick_max_passes is None:
+            quick_routes = build_quick_routes(request, slack_max, max_time_per_vehicle)
+        else:
+            quick_routes = build_quick_routes(request, slack_max, max_time_per_vehicle, None, quick_max_passes)
+
+    # Restrict the successors of every appointment to its nearest time feasible appointments (or the route end),
+    # so the first solution and local search operators only consider realistic arcs
+    if candidate_neighbours is None:
+        candidate_neighbours = CANDIDATE_NEIGHBOURS if len(appointments) >= CANDIDATE_MIN_APPOINTMENTS else 0
+    if candidate_neighbours > 0:
+        arc_model = QuickRoutingModel(
+            time_windows, service_times, time_matrix, distance_matrix, eligibility, slack_max, max_time_per_vehicle
+        )
+        appointment_nodes = np.arange(1, num_locations)
+        end_indices = [routing.End(vehicle_id) for vehicle_id in range(num_vehicles)]
+        candidates = nearest_feasible_successors(
+            appointments,
+            lambda begin, end: arc_model.arc_feasible(appointment_nodes[begin:end, None], appointment_nodes[None, :]),
+            candidate_neighbours
+        )
+        if quick_routes is not None:
+            # The arcs of the start routes must stay allowed, otherwise the routes are rejected as start solution
+            candidates = add_route_neighbours(candidates, quick_routes)
+        for node, successors in enumerate(candidates, 1):
+            routing.NextVar(manager.NodeToIndex(node)).SetValues(
+                [manager.NodeToIndex(int(successor) + 1) for successor in successors] + end_indices
+            )
+        optimization_problem_information.append(f"Successors limited to the {candidate_neighbours} nearest appointments")
+
     # Search parameters
     search_params = pywrapcp.DefaultRoutingSearchParameters()
     search_params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
     search_params.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
-    search_params.time_limit.FromSeconds(optimization_time_limit)
+    search_params.time_limit.FromMilliseconds(int(optimization_time_limit * 1000))
     search_params.log_search = False  # production-friendly
-
-    # Solve
-    solution = routing.SolveWithParameters(search_params)
+    if solution_limit:
+        # Stops after a fixed number of solutions instead of wall time, so replays are reproducible
+        search_params.solution_limit = solution_limit
+
+    initial_assignment = None
+    if quick_routes is not None:
+        routing.CloseModelWithParameters(search_params)
+        initial_assignment = routing.ReadAssignmentFromRoutes(
+            [[manager.NodeToIndex(node) for node in route] for route in quick_routes], True
+        )
+        if initial_assignment is None:
+            print(QUICK_START_REJECTED)
+            optimization_problem_information.append(QUICK_START_REJECTED)
+    elif use_quick_initial_solution:
+        optimization_problem_information.append("The quick heuristic found no start solution")
+
+    if initial_assignment is not None:
+        optimization_problem_information.append("Started from the quick heuristic solution")
+        solution = routing.SolveFromAssignmentWithParameters(initial_assignment, search_params)
+    else:
+        solution = routing.SolveWithParameters(search_params)
     if not solution:
         no_solution_info = ", ".join(optimization_problem_information)
         return Solution(
@@ -199,7 +274,9 @@ def solve_appointment_routing_pca(
         total_distance_traveled=total_distance,
         max_distance_traveled=max_distance,
         routes=routes,
-        method_used="Path Cheapest Arc"
+        # The pure heuristic result (/api/quick-solve) reports "Quick Insertion"
+        method_used="Guided Local Search (seeded by Quick Insertion)" if initial_assignment is not None
+        else "Path Cheapest Arc"
     )
     
     # Check routes for validity
@@ -1,5 +1,12 @@
+import numpy as np
 from datetime import datetime
 
 def to_minutes(dt_str: str) -> int:
     dt = datetime.fromisoformat(dt_str)
-    return dt.hour * 60 + dt.minute
\ No newline at end of file
+    return dt.hour * 60 + dt.minute
+
+def matrix_to_lists(matrix):
+    # Matrices received in binary form are NumPy arrays; the OR-Tools callbacks index plain lists fastest
+    if isinstance(matrix, np.ndarray):
+        return matrix.tolist()
+    return matrix
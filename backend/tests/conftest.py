@@ -0,0 +1,61 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The backend modules are imported by name, like in app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from broker.base import get_broker  # noqa: E402
+
+
+def make_request(appointment_count: int = 6, vehicle_count: int = 2) -> dict:
+    """
+    Builds an EnhancedOptimizationRequest payload with appointments spread over the day
+    and travel times that grow with the straight-line distance.
+    """
+    random = np.random.default_rng(0)
+    appointments = []
+    for i in range(appointment_count):
+        hour = 8 + i * 8 // appointment_count
+        appointments.append({
+            "appointment_start": f"2025-04-29 {hour:02d}:00:00.000",
+            "appointment_end": f"2025-04-29 {hour:02d}:30:00.000",
+            "address": {"street": f"Street {i}", "zip_code": "10997", "city": "Berlin"},
+            "location": {"id": f"L{i}", "lat": 52.5 + random.random() * 0.1, "lng": 13.4 + random.random() * 0.1},
+            "number_of_workers": 1,
+        })
+
+    depot = "Görlitzer Str. 3"
+    points = np.array([(52.55, 13.45)] + [(a["location"]["lat"], a["location"]["lng"]) for a in appointments])
+    distances = np.sqrt(((points[:, None, :] - points[None, :, :]) ** 2).sum(-1)) * 70000
+    return {
+        "company_info": {
+            "start_address": {"street": depot, "zip_code": "10997", "city": "Berlin"},
+            "finish_address": {"street": depot, "zip_code": "10997", "city": "Berlin"},
+            "number_of_workers": [
+                {"vehicle_id": v, "skills": "electrician", "worker_amount": 2} for v in range(vehicle_count)
+            ],
+        },
+        "appointments": appointments,
+        "time_matrix": (distances / 500).astype(int).tolist(),
+        "distance_matrix": distances.astype(int).tolist(),
+    }
+
+
+@pytest.fixture
+def sqlite_broker(tmp_path, monkeypatch):
+    monkeypatch.setenv("BROKER_URL", f"sqlite:///{tmp_path / 'broker.db'}")
+    get_broker.cache_clear()
+    yield get_broker()
+    get_broker.cache_clear()
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    import app
+
+    return TestClient(app.app)
@@ -0,0 +1,48 @@
+import base64
+
+import numpy as np
+
+import distance_matrix
+
+LOCATIONS = [{"id": "a", "lat": 52.5, "lng": 13.4}, {"id": "b", "lat": 52.6, "lng": 13.5}]
+
+
+def fake_matrices(origins, destinations=None, departure_time=None):
+    distances = np.array([[0, 1200], [1300, -1]], dtype=np.int32)
+    durations = np.array([[0, 180], [200, -1]], dtype=np.int32)
+    return distances, durations
+
+
+def decode(values: str) -> list:
+    return np.frombuffer(base64.b64decode(values), dtype="<i4").reshape(2, 2).tolist()
+
+
+def test_columnar_distance_matrix(client, monkeypatch):
+    monkeypatch.setattr(distance_matrix, "fetch_distance_and_duration_seconds", fake_matrices)
+
+    response = client.post("/api/distance-matrix?format=columnar", json={"locations": LOCATIONS})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ids"] == ["a", "b"]
+    assert decode(body["distance_values"]) == [[0, 1200], [1300, 0]]
+    assert decode(body["duration_values"]) == [[0, 180], [200, 0]]
+    assert body["failed_cells"] == [[1, 1]]
+
+
+def test_distance_matrix_as_lists(client, monkeypatch):
+    monkeypatch.setattr(distance_matrix, "fetch_distance_and_duration_seconds", fake_matrices)
+
+    response = client.post("/api/distance-matrix", json={"locations": LOCATIONS})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "ids": ["a", "b"],
+        "distance_matrix": [[0, 1200], [1300, -1]],
+        "duration_matrix": [[0, 3], [3, -1]],
+    }
+
+
+def test_unknown_format_is_rejected(client):
+    response = client.post("/api/distance-matrix?format=csv", json={"locations": LOCATIONS})
+    assert response.status_code == 422
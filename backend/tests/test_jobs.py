@@ -0,0 +1,39 @@
+import json
+
+import numpy as np
+
+import worker
+from conftest import make_request
+from matrix_transport import dump_matrix
+
+# Keeps the solves short
+SOLVE_HEADERS = {"X-Latency-Target-Ms": "2000"}
+
+
+def test_multipart_job_is_solved_by_worker(sqlite_broker, client):
+    payload = make_request()
+    files = {
+        "time_matrix": ("time_matrix.npy", dump_matrix(np.array(payload.pop("time_matrix")))),
+        "distance_matrix": ("distance_matrix.npy", dump_matrix(np.array(payload.pop("distance_matrix")))),
+    }
+    response = client.post("/api/jobs", data={"request": json.dumps(payload)}, files=files, headers=SOLVE_HEADERS)
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status"] == "queued"
+
+    worker.run_worker(poll_timeout=0.1, max_jobs=1)
+
+    job = client.get(f"/api/jobs/{job['job_id']}").json()
+    assert job["status"] == "done", job["error"]
+    assert job["solution"]["routes"]
+
+
+def test_same_request_is_answered_from_cache(sqlite_broker, client):
+    payload = make_request()
+    first = client.post("/api/jobs", json=payload, headers=SOLVE_HEADERS).json()
+    worker.run_worker(poll_timeout=0.1, max_jobs=1)
+    assert client.get(f"/api/jobs/{first['job_id']}").json()["status"] == "done"
+
+    second = client.post("/api/jobs", json=payload, headers=SOLVE_HEADERS).json()
+    assert second["status"] == "done"
+    assert second["solution"] == client.get(f"/api/jobs/{first['job_id']}").json()["solution"]
@@ -0,0 +1,39 @@
+import pytest
+
+from geocoding.local_index import LocalAddressIndex, LocalGeocoder, make_record
+
+
+@pytest.fixture
+def geocoder():
+    records = [
+        make_record("Görlitzer Straße", "5", "10997", "Berlin", 52.4986, 13.4383),
+        make_record("Görlitzer Straße", "7", "10997", "Berlin", 52.4984, 13.4387),
+        make_record("Oranienstraße", "5", "10999", "Berlin", 52.5010, 13.4190),
+    ]
+    return LocalGeocoder(LocalAddressIndex.build(records))
+
+
+def test_exact_address_is_fully_found(geocoder):
+    result = geocoder.geocode("Görlitzer Str. 5", "10997", "Berlin")
+    assert result.could_be_fully_found
+    assert result.error_information is None
+    assert result.latitude == pytest.approx(52.4986, abs=1e-4)
+
+
+def test_fuzzy_street_match_is_not_fully_found(geocoder):
+    result = geocoder.geocode("Gorlitzer Str 5", "10997", "Berlin")
+    assert not result.could_be_fully_found
+    assert "görlitzer str 5, 10997" in result.error_information
+    assert result.latitude == pytest.approx(52.4986, abs=1e-4)
+
+
+def test_fuzzy_zip_match_is_not_fully_found(geocoder):
+    result = geocoder.geocode("Oranienstraße 5", "10997", "Berlin")
+    assert not result.could_be_fully_found
+    assert "10999" in result.error_information
+
+
+def test_unknown_zip_is_matched_by_city(geocoder):
+    result = geocoder.geocode("Görlitzer Str. 7", "10000", "Berlin")
+    assert not result.could_be_fully_found
+    assert result.error_information.startswith("Zip code not found")
@@ -0,0 +1,33 @@
+import numpy as np
+
+from conftest import make_request
+from solver import neighbours
+from solver.models import EnhancedOptimizationRequest
+from solver.neighbours import add_route_neighbours, nearest_feasible_successors, to_unit_vectors
+
+
+def test_successors_are_nearest_feasible_per_block(monkeypatch):
+    monkeypatch.setattr(neighbours, "CHUNK_ROWS", 7)
+    appointments = EnhancedOptimizationRequest.model_validate(make_request(30, 4)).appointments
+    feasible = np.random.default_rng(1).random((30, 30)) < 0.5
+    requested_rows = []
+
+    def feasible_rows(begin, end):
+        requested_rows.append(end - begin)
+        return feasible[begin:end]
+
+    successors = nearest_feasible_successors(appointments, feasible_rows, 5)
+
+    assert max(requested_rows) == 7 and sum(requested_rows) == 30
+    points = to_unit_vectors(appointments)
+    for i, candidates in enumerate(successors):
+        allowed = [j for j in np.flatnonzero(feasible[i]) if j != i]
+        distances = np.linalg.norm(points[allowed] - points[i], axis=1)
+        expected = np.asarray(allowed)[np.argsort(distances)[:5]]
+        assert sorted(candidates.tolist()) == sorted(expected.tolist())
+
+
+def test_route_neighbours_are_added():
+    successors = [np.array([], dtype=np.int64) for _ in range(3)]
+    extended = add_route_neighbours(successors, [[1, 3], [2]])
+    assert [candidates.tolist() for candidates in extended] == [[2], [], [0]]
@@ -0,0 +1,32 @@
+from capture.recorder import write_capture
+from capture.replay import replay
+from conftest import make_request
+from solver.models import EnhancedOptimizationRequest, Solution
+from solver.quick import QUICK_MAX_PASSES
+
+
+def capture_request(tmp_path, solver: str, settings: dict) -> str:
+    request = EnhancedOptimizationRequest.model_validate(make_request(40, 8))
+    solution = Solution(total_distance_traveled=0, max_distance_traveled=0, routes=[], method_used="")
+    return write_capture(str(tmp_path), solver, request, settings, solution, {"solve_seconds": 0.0})
+
+
+def test_quick_replay_runs_recorded_passes_without_time_limit(tmp_path):
+    path = capture_request(tmp_path, "quick", {"time_limit_ms": 1})
+
+    first, second = replay(path), replay(path)
+
+    assert first["settings"]["time_limit_ms"] is None
+    assert first["settings"]["max_passes"] == QUICK_MAX_PASSES
+    assert first["solution"]["routes"]
+    assert first["solution"] == second["solution"]
+
+
+def test_seeded_replay_is_reproducible(tmp_path):
+    path = capture_request(tmp_path, "pca", {"optimization_time_limit": 1, "use_quick_initial_solution": True})
+
+    first, second = replay(path, solution_limit=20), replay(path, solution_limit=20)
+
+    assert first["settings"]["quick_max_passes"] == QUICK_MAX_PASSES
+    assert first["solution"]["routes"]
+    assert first["solution"] == second["solution"]
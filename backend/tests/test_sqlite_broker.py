@@ -0,0 +1,34 @@
+import time
+
+from broker.sqlite_broker import SqliteBroker
+
+
+def test_expired_entries_are_purged_on_write(tmp_path):
+    broker = SqliteBroker(str(tmp_path / "broker.db"), lease_seconds=600)
+    broker.set("old", b"1", ttl=1)
+    broker.set("kept", b"2")
+    broker.connection().execute("UPDATE entries SET expires_at = ? WHERE key = 'old'", (time.time() - 1,))
+
+    broker.purged_at = 0.0
+    broker.set("new", b"3", ttl=60)
+
+    keys = [row[0] for row in broker.connection().execute("SELECT key FROM entries ORDER BY key")]
+    assert keys == ["kept", "new"]
+
+
+def test_acknowledged_jobs_are_deleted(tmp_path):
+    broker = SqliteBroker(str(tmp_path / "broker.db"), lease_seconds=600)
+    broker.enqueue("solve:1", "a", b"payload")
+    assert broker.dequeue(["solve:0", "solve:1"], timeout=0) == ("solve:1", "a", b"payload")
+    assert broker.dequeue(["solve:1"], timeout=0) is None
+
+    broker.ack("solve:1", "a")
+    assert broker.connection().execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 0
+
+
+def test_expired_lease_hands_job_out_again(tmp_path):
+    broker = SqliteBroker(str(tmp_path / "broker.db"), lease_seconds=0)
+    broker.enqueue("solve:1", "a", b"payload")
+    assert broker.dequeue(["solve:1"], timeout=0) is not None
+    time.sleep(0.01)
+    assert broker.dequeue(["solve:1"], timeout=0) == ("solve:1", "a", b"payload")
@@ -0,0 +1,40 @@
+import argparse
+
+from dotenv import load_dotenv
+
+# Before the imports below, they read their settings from the environment when imported
+load_dotenv()
+
+from broker.base import get_broker
+from jobs import SOLVE_QUEUES, run_solve_job
+
+
+def run_worker(poll_timeout: float = 5.0, max_jobs: int = 0):
+    """
+    Consumes solve jobs until stopped (or after max_jobs jobs). Start one worker per CPU core on every
+    solver node, all of them pointing to the same BROKER_URL.
+    """
+    broker = get_broker()
+    if broker is None:
+        raise RuntimeError("BROKER_URL is not set in environment variables")
+
+    processed = 0
+    while not max_jobs or processed < max_jobs:
+        job = broker.dequeue(SOLVE_QUEUES, poll_timeout)
+        if job is None:
+            continue
+        queue, job_id, payload = job
+        print(f"Solving job {job_id}")
+        try:
+            run_solve_job(job_id, payload)
+        finally:
+            # Acknowledged only when finished: if the worker dies, the job is handed out again after the lease
+            broker.ack(queue, job_id)
+        processed += 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solver worker consuming jobs from BROKER_URL")
+    parser.add_argument("--max-jobs", type=int, default=0, help="Stop after this many jobs (0: run forever)")
+    args = parser.parse_args()
+    run_worker(max_jobs=args.max_jobs)